@@ -1,13 +1,111 @@
+import asyncio
+import csv
 import json
+import math
+import os
+import mmap
+import struct
+import threading
 from abc import ABC, abstractmethod
-from uuid import uuid4
+from array import array
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from uuid import UUID, uuid4
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+### Money Helpers
+# Balances are held as integer cents; dollars only appear at the API, display and JSON boundaries
+def to_cents(amount):
+    if isinstance(amount, int):
+        return amount * 100
+    return round(amount * 100)
+
+### JSONStream Class
+# Decodes one JSON value at a time from a file read in fixed-size chunks, so a large snapshot never sits in memory whole
+class JSONStream:
+    def __init__(self, f, chunk_size=1 << 16):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._consumed = 0
+        self._eof = False
+
+    @property
+    def offset(self):
+        return self._consumed + self._position
+
+    def _fill(self):
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._consumed += self._position
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def peek(self):
+        # Next non-whitespace character, or '' at the end of the input
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in ' \t\r\n':
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.offset}")
+        self._position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except ValueError:
+                if self._eof or not self._fill():
+                    raise
+                continue
+            # A number or literal that ends the buffer may continue in the next chunk
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._position = end
+            return value
 
 ### Account Class (Abstract)
 class Account(ABC):
+    __slots__ = ('_account_number', '_account_holder_id', '_own_balance', '_store', '_slot')
+
     def __init__(self, account_number, account_holder_id, initial_balance=0.0):
         self._account_number = account_number
         self._account_holder_id = account_holder_id
-        self._balance = initial_balance
+        self._own_balance = to_cents(initial_balance)
+        # Set when the account is attached to an AccountStore; the balance then lives in its column
+        self._store = None
+        self._slot = None
+
+    @property
+    def _balance(self):
+        if self._store is None:
+            return self._own_balance
+        return self._store.balances[self._slot]
+
+    @_balance.setter
+    def _balance(self, value):
+        if self._store is None:
+            self._own_balance = value
+        else:
+            self._store.set_balance(self._slot, value)
 
     @property
     def account_number(self):
@@ -15,6 +113,10 @@ class Account(ABC):
 
     @property
     def balance(self):
+        return self._balance / 100
+
+    @property
+    def balance_cents(self):
         return self._balance
 
     @property
@@ -41,6 +143,8 @@ class Account(ABC):
 
 ### SavingsAccount Class
 class SavingsAccount(Account):
+    __slots__ = ('_interest_rate',)
+
     def __init__(self, account_number, account_holder_id, initial_balance=0.0, interest_rate=0.01):
         super().__init__(account_number, account_holder_id, initial_balance)
         self._interest_rate = interest_rate
@@ -54,21 +158,25 @@ class SavingsAccount(Account):
         if value < 0:
             raise ValueError("Interest rate cannot be negative")
         self._interest_rate = value
+        if self._store is not None:
+            self._store.interest_rates[self._slot] = value
 
     def deposit(self, amount):
-        if amount > 0:
-            self._balance += amount
+        cents = to_cents(amount)
+        if cents > 0:
+            self._balance += cents
             return True
         return False
 
     def withdraw(self, amount):
-        if 0 < amount <= self.balance:
-            self._balance -= amount
+        cents = to_cents(amount)
+        if 0 < cents <= self._balance:
+            self._balance -= cents
             return True
         return False
 
     def apply_interest(self):
-        self._balance += self.balance * self.interest_rate
+        self._balance += round(self._balance * self.interest_rate)
 
     def display_details(self):
         return f"{super().display_details()}, Interest Rate: {self.interest_rate*100}%"
@@ -81,29 +189,35 @@ class SavingsAccount(Account):
 
 ### CheckingAccount Class
 class CheckingAccount(Account):
+    __slots__ = ('_overdraft_limit',)
+
     def __init__(self, account_number, account_holder_id, initial_balance=0.0, overdraft_limit=0.0):
         super().__init__(account_number, account_holder_id, initial_balance)
-        self._overdraft_limit = overdraft_limit
+        self._overdraft_limit = to_cents(overdraft_limit)
 
     @property
     def overdraft_limit(self):
-        return self._overdraft_limit
+        return self._overdraft_limit / 100
 
     @overdraft_limit.setter
     def overdraft_limit(self, value):
         if value < 0:
             raise ValueError("Overdraft limit cannot be negative")
-        self._overdraft_limit = value
+        self._overdraft_limit = to_cents(value)
+        if self._store is not None:
+            self._store.overdraft_limits[self._slot] = self._overdraft_limit
 
     def deposit(self, amount):
-        if amount > 0:
-            self._balance += amount
+        cents = to_cents(amount)
+        if cents > 0:
+            self._balance += cents
             return True
         return False
 
     def withdraw(self, amount):
-        if 0 < amount <= self.balance + self.overdraft_limit:
-            self._balance -= amount
+        cents = to_cents(amount)
+        if 0 < cents <= self._balance + self._overdraft_limit:
+            self._balance -= cents
             return True
         return False
 
@@ -116,13 +230,314 @@ class CheckingAccount(Account):
         data["overdraft_limit"] = self.overdraft_limit
         return data
 
+### SnapshotColumn Class
+# A fixed-width column whose leading rows are read and written in place in the mapped snapshot;
+# rows appended after the snapshot was loaded live in an ordinary array
+class SnapshotColumn:
+    __slots__ = ('_view', '_count', '_tail')
+
+    def __init__(self, view, typecode):
+        self._view = view
+        self._count = len(view)
+        self._tail = array(typecode)
+
+    def __len__(self):
+        return self._count + len(self._tail)
+
+    def __getitem__(self, index):
+        if index < self._count:
+            return self._view[index]
+        return self._tail[index - self._count]
+
+    def __setitem__(self, index, value):
+        if index < self._count:
+            self._view[index] = value
+        else:
+            self._tail[index - self._count] = value
+
+    def append(self, value):
+        self._tail.append(value)
+
+    def segments(self):
+        return (self._view, self._tail)
+
+def column_segments(column):
+    return column.segments() if isinstance(column, SnapshotColumn) else (column,)
+
+### AccountStore Class
+class AccountStore:
+    CLOSED = 0
+    SAVINGS = 1
+    CHECKING = 2
+
+    # Binary snapshot: header, then columns sorted by account number
+    # (balance cents, interest rate, overdraft limit cents, holder index), the per-holder total cents,
+    # the 16-byte UUID and kind columns, and finally the holder ids as a JSON list
+    SNAPSHOT_MAGIC = b'BANKSNP1'
+    SNAPSHOT_HEADER = struct.Struct('<8sQQ')
+
+    def __init__(self):
+        self._slots = {}  # account_number: slot, for accounts created or touched since the snapshot
+        self._live = 0
+        self.kinds = array('b')
+        self.balances = array('q')  # cents
+        self.interest_rates = array('d')
+        self.overdraft_limits = array('q')  # cents
+        self.holders = array('q')  # slot: holder index
+        # Running balance total per account holder, kept in step with every balance change
+        self._holder_index = {}  # account_holder_id: holder index
+        self._holder_ids = []
+        self.holder_totals = array('q')  # cents
+        # Slots below _snapshot_count come from the memory-mapped snapshot, keyed by its sorted UUID column
+        self._snapshot = None
+        self._snapshot_keys_offset = 0
+        self._snapshot_count = 0
+
+    def __len__(self):
+        return self._live
+
+    def __iter__(self):
+        for account_number in self._slots:
+            yield account_number
+        for slot in range(self._snapshot_count):
+            if self.kinds[slot] != self.CLOSED:
+                account_number = str(UUID(bytes=self._snapshot_key(slot)))
+                if account_number not in self._slots:
+                    yield account_number
+
+    def _holder(self, account_holder_id):
+        index = self._holder_index.get(account_holder_id)
+        if index is None:
+            index = len(self.holder_totals)
+            self._holder_index[account_holder_id] = index
+            self._holder_ids.append(account_holder_id)
+            self.holder_totals.append(0)
+        return index
+
+    def holder_total(self, account_holder_id):
+        index = self._holder_index.get(account_holder_id)
+        return 0.0 if index is None else self.holder_totals[index] / 100
+
+    def _snapshot_key(self, slot):
+        offset = self._snapshot_keys_offset + slot * 16
+        return self._snapshot[offset:offset + 16]
+
+    def _find_snapshot_slot(self, account_number):
+        try:
+            key = UUID(account_number).bytes
+        except (ValueError, AttributeError, TypeError):
+            return None
+        low, high = 0, self._snapshot_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._snapshot_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._snapshot_count and self._snapshot_key(low) == key:
+            return low
+        return None
+
+    def slot_of(self, account_number):
+        slot = self._slots.get(account_number)
+        if slot is None and self._snapshot_count:
+            slot = self._find_snapshot_slot(account_number)
+            if slot is not None and self.kinds[slot] == self.CLOSED:
+                return None
+        return slot
+
+    def materialize(self, account_number):
+        slot = self.slot_of(account_number)
+        if slot is None:
+            return None
+        holder_id = self._holder_ids[self.holders[slot]]
+        if self.kinds[slot] == self.SAVINGS:
+            account = SavingsAccount(account_number, holder_id, interest_rate=self.interest_rates[slot])
+        else:
+            account = CheckingAccount(account_number, holder_id)
+            account._overdraft_limit = self.overdraft_limits[slot]
+        self._slots[account_number] = slot
+        account._store = self
+        account._slot = slot
+        return account
+
+    def set_balance(self, slot, value):
+        self.holder_totals[self.holders[slot]] += value - self.balances[slot]
+        self.balances[slot] = value
+
+    def attach(self, account):
+        balance = account.balance_cents
+        kind = self.SAVINGS if isinstance(account, SavingsAccount) else self.CHECKING
+        rate = account.interest_rate if kind == self.SAVINGS else 0.0
+        limit = account._overdraft_limit if kind == self.CHECKING else 0
+        holder = self._holder(account.account_holder_id)
+        slot = self.slot_of(account.account_number)
+        if slot is None:
+            slot = len(self.balances)
+            self.kinds.append(kind)
+            self.balances.append(balance)
+            self.interest_rates.append(rate)
+            self.overdraft_limits.append(limit)
+            self.holders.append(holder)
+            self._live += 1
+        else:
+            self.holder_totals[self.holders[slot]] -= self.balances[slot]
+            self.kinds[slot] = kind
+            self.balances[slot] = balance
+            self.interest_rates[slot] = rate
+            self.overdraft_limits[slot] = limit
+            self.holders[slot] = holder
+        self._slots[account.account_number] = slot
+        self.holder_totals[holder] += balance
+        account._store = self
+        account._slot = slot
+
+    def detach(self, account):
+        slot = self.slot_of(account.account_number)
+        if slot is not None:
+            self._slots.pop(account.account_number, None)
+            account._own_balance = self.balances[slot]
+            account._store = None
+            account._slot = None
+            self.holder_totals[self.holders[slot]] -= self.balances[slot]
+            self.kinds[slot] = self.CLOSED
+            self._live -= 1
+
+    def account_numbers(self, kind):
+        return [account_number for account_number in self if self.kinds[self.slot_of(account_number)] == kind]
+
+    @classmethod
+    def is_snapshot(cls, path):
+        with open(path, 'rb') as f:
+            return f.read(len(cls.SNAPSHOT_MAGIC)) == cls.SNAPSHOT_MAGIC
+
+    def load_snapshot(self, path):
+        with open(path, 'rb') as f:
+            # Copy-on-write: pages are read on first touch, and changed balances dirty private pages, never the file
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, count, holder_count = self.SNAPSHOT_HEADER.unpack_from(snapshot)
+        if magic != self.SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a bank snapshot")
+        offset = self.SNAPSHOT_HEADER.size
+        view = memoryview(snapshot)
+
+        def column(typecode, length):
+            nonlocal offset
+            size = length * array(typecode).itemsize
+            data = SnapshotColumn(view[offset:offset + size].cast(typecode), typecode)
+            offset += size
+            return data
+
+        # Columns are views into the mapping; no per-account objects, key strings or column copies are built here
+        self.balances = column('q', count)
+        self.interest_rates = column('d', count)
+        self.overdraft_limits = column('q', count)
+        self.holders = column('q', count)
+        self.holder_totals = column('q', holder_count)
+        self._snapshot_keys_offset = offset
+        offset += count * 16
+        self.kinds = column('b', count)
+        self._holder_ids = json.loads(snapshot[offset:].decode('utf-8'))
+        self._holder_index = {holder_id: index for index, holder_id in enumerate(self._holder_ids)}
+        self._snapshot = snapshot
+        self._snapshot_count = count
+        self._slots = {}
+        self._live = count
+
+    def write_snapshot(self, f, pending=None):
+        # pending maps accounts inside open transactions to their committed balance, or None if not yet committed
+        pending = pending or {}
+        entries = []
+        for account_number in self:
+            slot = self.slot_of(account_number)
+            balance = pending.get(account_number, self.balances[slot])
+            if balance is not None:
+                entries.append((UUID(account_number).bytes, slot, balance))
+        entries.sort()
+        slots = [slot for _, slot, _ in entries]
+        # Totals are summed from the balances being written, so the two always agree
+        totals = array('q', bytes(8 * len(self._holder_ids)))
+        for _, slot, balance in entries:
+            totals[self.holders[slot]] += balance
+        f.write(self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, len(slots), len(self._holder_ids)))
+        f.write(array('q', (balance for _, _, balance in entries)).tobytes())
+        f.write(array('d', (self.interest_rates[slot] for slot in slots)).tobytes())
+        f.write(array('q', (self.overdraft_limits[slot] for slot in slots)).tobytes())
+        f.write(array('q', (self.holders[slot] for slot in slots)).tobytes())
+        f.write(totals.tobytes())
+        f.write(b''.join(key for key, _, _ in entries))
+        f.write(array('b', (self.kinds[slot] for slot in slots)).tobytes())
+        f.write(json.dumps(self._holder_ids).encode('utf-8'))
+
+    def apply_interest_all(self):
+        if not self.balances:
+            return
+        if np is not None:
+            # A loaded snapshot splits each column into the mapped rows and the rows added since
+            totals = [np.frombuffer(segment, dtype=np.int64) for segment in column_segments(self.holder_totals)]
+            for balances, rates, kinds, holders in zip(*(column_segments(column) for column in
+                                                        (self.balances, self.interest_rates, self.kinds, self.holders))):
+                balances = np.frombuffer(balances, dtype=np.int64)
+                rates = np.frombuffer(rates, dtype=np.float64)
+                savings = np.frombuffer(kinds, dtype=np.int8) == self.SAVINGS
+                interest = np.rint(balances[savings] * rates[savings]).astype(np.int64)
+                balances[savings] += interest
+                holders = np.frombuffer(holders, dtype=np.int64)[savings]
+                boundary = 0
+                for segment in totals:
+                    in_segment = (holders >= boundary) & (holders < boundary + len(segment))
+                    np.add.at(segment, holders[in_segment] - boundary, interest[in_segment])
+                    boundary += len(segment)
+        else:
+            balances, rates, kinds, holders, totals = self.balances, self.interest_rates, self.kinds, self.holders, self.holder_totals
+            for slot in range(len(balances)):
+                if kinds[slot] == self.SAVINGS:
+                    interest = round(balances[slot] * rates[slot])
+                    balances[slot] += interest
+                    totals[holders[slot]] += interest
+
+### AccountMap Class
+class AccountMap(MutableMapping):
+    def __init__(self, store):
+        self._store = store
+        self._loaded = {}  # account_number: Account, materialized on first access
+
+    def __getitem__(self, account_number):
+        account = self._loaded.get(account_number)
+        if account is None:
+            account = self._store.materialize(account_number)
+            if account is None:
+                raise KeyError(account_number)
+            self._loaded[account_number] = account
+        return account
+
+    def __setitem__(self, account_number, account):
+        self._store.attach(account)
+        self._loaded[account_number] = account
+
+    def __delitem__(self, account_number):
+        account = self[account_number]
+        self._store.detach(account)
+        del self._loaded[account_number]
+
+    def __contains__(self, account_number):
+        return account_number in self._loaded or self._store.slot_of(account_number) is not None
+
+    def __iter__(self):
+        return iter(self._store)
+
+    def __len__(self):
+        return len(self._store)
+
 ### Customer Class
 class Customer:
+    __slots__ = ('_customer_id', '_name', '_address', '_account_numbers')
+
     def __init__(self, customer_id, name, address):
         self._customer_id = customer_id
         self._name = name
         self._address = address
-        self._account_numbers = []
+        self._account_numbers = {}  # insertion-ordered set: account_number -> None
 
     @property
     def customer_id(self):
@@ -142,18 +557,23 @@ class Customer:
 
     @property
     def account_numbers(self):
-        return self._account_numbers.copy()
+        return list(self._account_numbers)
+
+    @property
+    def account_count(self):
+        return len(self._account_numbers)
+
+    def has_account(self, account_number):
+        return account_number in self._account_numbers
 
     def add_account_number(self, account_number):
-        if account_number not in self.account_numbers:
-            self._account_numbers.append(account_number)
+        self._account_numbers.setdefault(account_number)
 
     def remove_account_number(self, account_number):
-        if account_number in self._account_numbers:
-            self._account_numbers.remove(account_number)
+        self._account_numbers.pop(account_number, None)
 
     def display_details(self):
-        return f"Customer ID: {self.customer_id}, Name: {self.name}, Address: {self.address}, Accounts: {len(self.account_numbers)}"
+        return f"Customer ID: {self.customer_id}, Name: {self.name}, Address: {self.address}, Accounts: {self.account_count}"
 
     def to_dict(self):
         return {
@@ -163,63 +583,486 @@ class Customer:
             "account_numbers": self.account_numbers,
         }
 
+### TransactionAborted Exception
+class TransactionAborted(Exception):
+    pass
+
+### TransactionConflict Exception
+# Raised when a transaction would have to wait for a lock out of order; the transaction is rolled back and can be retried
+class TransactionConflict(Exception):
+    pass
+
 ### Bank Class
 class Bank:
-    def __init__(self, customer_file='customers.json', account_file='accounts.json'):
+    def __init__(self, customer_file='customers.json', account_file='accounts.json', journal_file=None, compact_every=1000,
+                 lock_stripes=64, snapshot_format='json', on_progress=None, lock_timeout=1.0, snapshot_file=None):
         self._customers = {}
-        self._accounts = {}
+        self._store = AccountStore()
+        self._accounts = AccountMap(self._store)
         self._customer_file = customer_file
         self._account_file = account_file
+        # 'binary' keeps accounts in a memory-mapped columnar snapshot of their own (accounts.snap beside
+        # accounts.json by default); the JSON file is then only read once, to convert it
+        self._snapshot_format = snapshot_format
+        self._snapshot_file = snapshot_file or os.path.splitext(account_file)[0] + '.snap'
+        # With a journal file, each mutation appends one record instead of rewriting both files
+        self._journal_file = journal_file
+        self._journal = None
+        self._journal_records = 0
+        self._compact_every = compact_every
+        # Group commit: every persisted change takes the next sequence number; one fsync (or, without a journal,
+        # one save) makes all of them up to the leader's number durable while the other writers wait for it
+        self._sync_cond = threading.Condition()
+        self._written_seq = 0
+        self._durable_seq = 0
+        self._syncing = False
+        # Guards the customer/account maps, the store layout and all file writes
+        self._lock = threading.RLock()
+        # Accounts hash onto a fixed pool of locks; multi-account operations take them in index order
+        self._account_locks = [threading.RLock() for _ in range(lock_stripes)]
+        self._lock_timeout = lock_timeout
+        self._local = threading.local()
+        # thread id: transaction stack, for every thread with an open transaction; snapshots write their before-images
+        self._open_transactions = {}
+        # Called as on_progress(path, records, offset) while the JSON files load
+        self._on_progress = on_progress
         self._load_data()
 
+    @property
+    def _tx_stack(self):
+        # One frame of before-images per open transaction on this thread, innermost last
+        stack = getattr(self._local, 'tx_stack', None)
+        if stack is None:
+            stack = self._local.tx_stack = []
+        return stack
+
+    @contextmanager
+    def _locked(self, *account_numbers, all_accounts=False):
+        if all_accounts:
+            indices = range(len(self._account_locks))
+        else:
+            indices = sorted({hash(account_number) % len(self._account_locks) for account_number in account_numbers})
+        stack = self._tx_stack
+        if stack:
+            # Two-phase locking: the stripes stay held until the outermost transaction ends
+            self._acquire_stripes(stack[0]['locks'], indices)
+            yield
+            return
+        locks = [self._account_locks[index] for index in indices]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _acquire_stripes(self, held, indices):
+        # A stripe above every one the transaction holds keeps the global order, so it is safe to wait for.
+        # A lower one could close a cycle with another transaction, so that wait is bounded and then abandoned.
+        top = max(held, default=-1)
+        for index in indices:
+            if index in held:
+                continue
+            lock = self._account_locks[index]
+            if index > top:
+                lock.acquire()
+            elif not lock.acquire(timeout=self._lock_timeout):
+                raise TransactionConflict(f"Timed out waiting for account lock stripe {index}")
+            held.add(index)
+            top = max(top, index)
+
+    @staticmethod
+    def _customer_from_dict(customer_id, customer_info):
+        customer = Customer(customer_id, customer_info['name'], customer_info['address'])
+        customer._account_numbers = dict.fromkeys(customer_info['account_numbers'])
+        return customer
+
+    @staticmethod
+    def _account_from_dict(account_number, account_info):
+        if account_info['type'] == 'savings':
+            return SavingsAccount(account_number, account_info['account_holder_id'], account_info['balance'], account_info['interest_rate'])
+        if account_info['type'] == 'checking':
+            return CheckingAccount(account_number, account_info['account_holder_id'], account_info['balance'], account_info['overdraft_limit'])
+        return None
+
+    def _read_json(self, path, key_field, progress_every=10000):
+        # Yields (key, record) from a JSON object keyed by ID, or from JSON Lines records carrying key_field
+        with open(path, 'r') as f:
+            stream = JSONStream(f)
+            count = 0
+            json_lines = path.lower().endswith('.jsonl')
+            if not json_lines:
+                stream.expect('{')
+            while stream.peek() not in ('', '}'):
+                if json_lines:
+                    record = stream.value()
+                    key = record[key_field]
+                else:
+                    key = stream.value()
+                    stream.expect(':')
+                    record = stream.value()
+                    if stream.peek() == ',':
+                        stream.expect(',')
+                yield key, record
+                count += 1
+                if self._on_progress and count % progress_every == 0:
+                    self._on_progress(path, count, stream.offset)
+            if not json_lines:
+                stream.expect('}')
+            if self._on_progress:
+                self._on_progress(path, count, stream.offset)
+
     def _load_data(self):
         try:
-            with open(self._customer_file, 'r') as f:
-                customers_data = json.load(f)
-                for customer_id, customer_info in customers_data.items():
-                    customer = Customer(customer_id, customer_info['name'], customer_info['address'])
-                    customer._account_numbers = customer_info['account_numbers']
-                    self._customers[customer_id] = customer
+            for customer_id, customer_info in self._read_json(self._customer_file, 'customer_id'):
+                self._customers[customer_id] = self._customer_from_dict(customer_id, customer_info)
         except FileNotFoundError:
             pass
+        if self._snapshot_format == 'binary' and self._snapshot_is_current():
+            self._store.load_snapshot(self._snapshot_file)
+        else:
+            self._check_account_file()
+            try:
+                for account_number, account_info in self._read_json(self._account_file, 'account_number'):
+                    account = self._account_from_dict(account_number, account_info)
+                    if account is not None:
+                        self._add_account(account)
+            except FileNotFoundError:
+                pass
+            if self._snapshot_format == 'binary':
+                # Accounts saved as JSON are converted once; from then on startup maps the snapshot
+                self._write_snapshot(self._snapshot_file)
+        if self._journal_file:
+            self._replay_journal()
+
+    def _snapshot_is_current(self):
+        # A JSON account file written after the snapshot (an export edited and saved, say) is converted again
+        if not os.path.exists(self._snapshot_file):
+            return False
+        return not (os.path.exists(self._account_file)
+                    and os.path.getmtime(self._account_file) > os.path.getmtime(self._snapshot_file))
+
+    def _check_account_file(self):
+        # Reading binary data as JSON would fail with a decode error, and reading JSON the snapshot has moved past
+        # would quietly bring back old balances
+        if os.path.exists(self._account_file) and AccountStore.is_snapshot(self._account_file):
+            raise ValueError(f"{self._account_file} is a binary account snapshot; open it with snapshot_format='binary' "
+                             f"and snapshot_file={self._account_file!r}")
+        if self._snapshot_format != 'binary' and self._snapshot_is_current():
+            raise ValueError(f"{self._snapshot_file} holds newer accounts than {self._account_file}; open the bank with "
+                             f"snapshot_format='binary' and export_accounts() first")
+
+    def _replay_journal(self):
+        torn = False
         try:
-            with open(self._account_file, 'r') as f:
-                accounts_data = json.load(f)
-                for account_number, account_info in accounts_data.items():
-                    if account_info['type'] == 'savings':
-                        account = SavingsAccount(account_number, account_info['account_holder_id'], account_info['balance'], account_info['interest_rate'])
-                    elif account_info['type'] == 'checking':
-                        account = CheckingAccount(account_number, account_info['account_holder_id'], account_info['balance'], account_info['overdraft_limit'])
-                    else:
-                        continue
-                    self._accounts[account_number] = account
+            with open(self._journal_file, 'r') as f:
+                for line in f:
+                    # A crash mid-append can leave a partial record, or a whole one without its newline that the
+                    # next append would run on into; either way the append never completed
+                    if not line.endswith('\n'):
+                        torn = True
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        torn = True
+                        break
+                    self._apply_record(record)
+                    self._journal_records += 1
         except FileNotFoundError:
-            pass
+            return
+        if torn:
+            self._save_data()
+
+    def _apply_record(self, record):
+        for customer_id, customer_info in record.get('customers', {}).items():
+            if customer_info is None:
+                self._customers.pop(customer_id, None)
+            else:
+                self._customers[customer_id] = self._customer_from_dict(customer_id, customer_info)
+        for account_number, account_info in record.get('accounts', {}).items():
+            account = None if account_info is None else self._account_from_dict(account_number, account_info)
+            if account is None:
+                self._drop_account(account_number)
+            else:
+                self._add_account(account)
+
+    def _add_account(self, account):
+        self._accounts[account.account_number] = account
+
+    def _drop_account(self, account_number):
+        self._accounts.pop(account_number, None)
+
+    @staticmethod
+    def _write_json(path, items):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            if path.lower().endswith('.jsonl'):
+                for _, record in items:
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            else:
+                json.dump(dict(items), f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _write_snapshot(self, path, pending=None):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            self._store.write_snapshot(f, pending)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _uncommitted_images(self):
+        # Before-images of everything touched by an open transaction on any thread; caller holds self._lock
+        customers, accounts = {}, {}
+        for stack in self._open_transactions.values():
+            for frame in stack:
+                for customer_id, customer_info in frame['customers'].items():
+                    customers.setdefault(customer_id, customer_info)
+                for account_number, account_info in frame['accounts'].items():
+                    accounts.setdefault(account_number, account_info)
+        return customers, accounts
+
+    @staticmethod
+    def _committed_records(items, images):
+        # Records an open transaction has touched are written as they were before it began
+        for key, record in items:
+            if key not in images:
+                yield key, record.to_dict()
+        for key, image in images.items():
+            if image is not None:
+                yield key, image
 
     def _save_data(self):
-        customers_data = {customer_id: customer.to_dict() for customer_id, customer in self._customers.items()}
-        with open(self._customer_file, 'w') as f:
-            json.dump(customers_data, f, indent=4)
-        accounts_data = {account_number: account.to_dict() for account_number, account in self._accounts.items()}
-        with open(self._account_file, 'w') as f:
-            json.dump(accounts_data, f, indent=4)
+        with self._lock:
+            with self._sync_cond:
+                covered = self._written_seq  # every change numbered so far is already in memory
+            customer_images, account_images = self._uncommitted_images()
+            self._write_json(self._customer_file, self._committed_records(self._customers.items(), customer_images))
+            if self._snapshot_format == 'binary':
+                pending = {account_number: None if account_info is None else to_cents(account_info['balance'])
+                           for account_number, account_info in account_images.items()}
+                self._write_snapshot(self._snapshot_file, pending)
+            else:
+                self._write_json(self._account_file, self._committed_records(self._accounts.items(), account_images))
+            if self._journal_file:
+                # The snapshot now covers every journaled record, so start a fresh journal
+                with self._sync_cond:
+                    if self._journal is not None:
+                        self._journal.close()
+                    self._journal = open(self._journal_file, 'w')
+                self._journal_records = 0
+            with self._sync_cond:
+                self._durable_seq = max(self._durable_seq, covered)
+                self._sync_cond.notify_all()
+
+    def export_accounts(self, path=None):
+        # Writes the committed accounts as JSON, by default over the account file a binary bank was converted from
+        with self._lock:
+            _, account_images = self._uncommitted_images()
+            self._write_json(path or self._account_file, self._committed_records(self._accounts.items(), account_images))
+
+    def _append_journal(self, record):
+        # The record reaches the OS under the lock, in order; the fsync is left to _wait_durable
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            with self._sync_cond:
+                if self._journal is None:
+                    self._journal = open(self._journal_file, 'a')
+            self._journal.write(line)
+            self._journal.flush()
+            seq = self._next_seq()
+            self._journal_records += 1
+            if self._journal_records >= self._compact_every:
+                self._save_data()
+        return seq
+
+    def _next_seq(self):
+        with self._sync_cond:
+            self._written_seq += 1
+            return self._written_seq
+
+    def _wait_durable(self, seq):
+        # Called with no bank or stripe lock held. The first writer to find its change not yet durable becomes the
+        # leader and syncs everything written so far; writers arriving meanwhile wait and are covered by the next sync
+        if seq is None:
+            return
+        while True:
+            with self._sync_cond:
+                while self._syncing and self._durable_seq < seq:
+                    self._sync_cond.wait()
+                if self._durable_seq >= seq:
+                    return
+                self._syncing = True
+                target = self._written_seq
+                # A duplicate descriptor stays valid if compaction swaps the journal while this one syncs
+                fd = os.dup(self._journal.fileno()) if self._journal_file else None
+            try:
+                if fd is None:
+                    self._save_data()
+                else:
+                    os.fsync(fd)
+                    with self._sync_cond:
+                        self._durable_seq = max(self._durable_seq, target)
+            finally:
+                if fd is not None:
+                    os.close(fd)
+                with self._sync_cond:
+                    self._syncing = False
+                    self._sync_cond.notify_all()
+
+    def _persist(self, customer_ids=(), account_numbers=()):
+        # Returns the change's sequence number for _wait_durable, or None when there is nothing to wait for yet
+        if self._tx_stack:
+            return None  # written once when the outermost transaction commits
+        if not self._journal_file:
+            seq = self._next_seq()
+        else:
+            record = {
+            "customers": {customer_id: self._customers[customer_id].to_dict() if customer_id in self._customers else None
+                          for customer_id in customer_ids},
+                "accounts": {account_number: self._accounts[account_number].to_dict() if account_number in self._accounts else None
+                             for account_number in account_numbers},
+            }
+            seq = self._append_journal(record)
+        return None if getattr(self._local, 'defer_sync', False) else seq
+
+    @contextmanager
+    def _deferred_sync(self):
+        # Changes made on this thread are written in order but not fsynced (or, without a journal, not saved)
+        # until _sync; a group of them then becomes durable with one fsync or one save
+        self._local.defer_sync = True
+        try:
+            yield
+        finally:
+            self._local.defer_sync = False
+
+    def _sync(self):
+        with self._sync_cond:
+            seq = self._written_seq
+        if seq:
+            self._wait_durable(seq)
+
+    def _remember(self, customer_ids=(), account_numbers=()):
+        if not self._tx_stack:
+            return
+        frame = self._tx_stack[-1]
+        # Recorded before the change is made, under the lock snapshots take to read open frames
+        with self._lock:
+            for customer_id in customer_ids:
+                if customer_id not in frame['customers']:
+                    customer = self._customers.get(customer_id)
+                    frame['customers'][customer_id] = customer.to_dict() if customer else None
+            for account_number in account_numbers:
+                if account_number not in frame['accounts']:
+                    account = self._accounts.get(account_number)
+                    frame['accounts'][account_number] = account.to_dict() if account else None
+
+    def _end_frame(self, frame):
+        # Caller holds self._lock; a nested frame folds its before-images into its parent
+        stack = self._tx_stack
+        stack.pop()
+        if stack:
+            parent = stack[-1]
+            for customer_id, customer_info in frame['customers'].items():
+                parent['customers'].setdefault(customer_id, customer_info)
+            for account_number, account_info in frame['accounts'].items():
+                parent['accounts'].setdefault(account_number, account_info)
+            return False
+        del self._open_transactions[threading.get_ident()]
+        return True
+
+    def _commit(self, frame):
+        with self._lock:
+            outermost = self._end_frame(frame)
+        if outermost and (frame['customers'] or frame['accounts']):
+            return self._persist(frame['customers'], frame['accounts'])
+        return None
+
+    def _rollback(self, frame):
+        with self._lock:
+            self._restore(frame)
+            self._end_frame(frame)
+
+    def _restore(self, frame):
+        for customer_id, customer_info in frame['customers'].items():
+            if customer_info is None:
+                self._customers.pop(customer_id, None)
+            elif customer_id in self._customers:
+                customer = self._customers[customer_id]
+                customer._address = customer_info['address']
+                customer._account_numbers = dict.fromkeys(customer_info['account_numbers'])
+            else:
+                self._customers[customer_id] = self._customer_from_dict(customer_id, customer_info)
+        for account_number, account_info in frame['accounts'].items():
+            if account_info is None:
+                self._drop_account(account_number)
+            elif account_number in self._accounts:
+                self._accounts[account_number]._balance = to_cents(account_info['balance'])
+            else:
+                self._add_account(self._account_from_dict(account_number, account_info))
+
+    @contextmanager
+    def transaction(self, *account_numbers):
+        stack = self._tx_stack
+        frame = {'customers': {}, 'accounts': {}, 'locks': set()}
+        seq = None
+        with self._lock:
+            if not stack:
+                self._open_transactions[threading.get_ident()] = stack
+            stack.append(frame)
+        try:
+            # Accounts named up front are locked together in a deadlock-free order
+            with self._locked(*account_numbers):
+                yield
+        except TransactionAborted:
+            self._rollback(frame)
+        except BaseException:
+            self._rollback(frame)
+            raise
+        else:
+            seq = self._commit(frame)
+        finally:
+            if not stack:
+                for index in frame['locks']:
+                    self._account_locks[index].release()
+        # Locks are released before the commit is made durable; anything that reads the change writes after it
+        self._wait_durable(seq)
+
+    def close(self):
+        self._sync()
+        with self._sync_cond:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
 
     def add_customer(self, customer):
-        if customer.customer_id not in self._customers:
+        with self._lock:
+            if customer.customer_id in self._customers:
+                return False
+            self._remember(customer_ids=[customer.customer_id])
             self._customers[customer.customer_id] = customer
-            self._save_data()
-            return True
-        return False
+            seq = self._persist(customer_ids=[customer.customer_id])
+        self._wait_durable(seq)
+        return True
 
     def remove_customer(self, customer_id):
-        if customer_id in self._customers and not self._customers[customer_id].account_numbers:
+        with self._lock:
+            if customer_id not in self._customers or self._customers[customer_id].account_count:
+                return False
+            self._remember(customer_ids=[customer_id])
             del self._customers[customer_id]
-            self._save_data()
-            return True
-        return False
+            seq = self._persist(customer_ids=[customer_id])
+        self._wait_durable(seq)
+        return True
 
     def create_account(self, customer_id, account_type, initial_balance=0.0, **kwargs):
-        if customer_id in self._customers:
+        with self._lock:
+            if customer_id not in self._customers:
+                return None
             account_number = str(uuid4())
             if account_type == 'savings':
                 account = SavingsAccount(account_number, customer_id, initial_balance, **kwargs)
@@ -227,36 +1070,136 @@ class Bank:
                 account = CheckingAccount(account_number, customer_id, initial_balance, **kwargs)
             else:
                 return None
-            self._accounts[account_number] = account
+            self._remember(customer_ids=[customer_id], account_numbers=[account_number])
+            self._add_account(account)
             self._customers[customer_id].add_account_number(account_number)
-            self._save_data()
-            return account
-        return None
+            seq = self._persist(customer_ids=[customer_id], account_numbers=[account_number])
+        self._wait_durable(seq)
+        return account
 
     def deposit(self, account_number, amount):
         if account_number in self._accounts:
-            result = self._accounts[account_number].deposit(amount)
-            self._save_data()
+            with self._locked(account_number):
+                self._remember(account_numbers=[account_number])
+                result = self._accounts[account_number].deposit(amount)
+                seq = self._persist(account_numbers=[account_number]) if result else None
+            self._wait_durable(seq)
             return result
         return False
 
     def withdraw(self, account_number, amount):
         if account_number in self._accounts:
-            result = self._accounts[account_number].withdraw(amount)
-            self._save_data()
+            with self._locked(account_number):
+                self._remember(account_numbers=[account_number])
+                result = self._accounts[account_number].withdraw(amount)
+                seq = self._persist(account_numbers=[account_number]) if result else None
+            self._wait_durable(seq)
             return result
         return False
 
+    def customer_accounts(self, customer_id):
+        customer = self._customers.get(customer_id)
+        if customer is None:
+            return []
+        return [self._accounts[account_number] for account_number in customer.account_numbers if account_number in self._accounts]
+
+    def customer_balance(self, customer_id):
+        return self._store.holder_total(customer_id)
+
+    def apply_interest_all(self):
+        with self._locked(all_accounts=True), self._lock:
+            if self._tx_stack:
+                self._remember(account_numbers=self._store.account_numbers(AccountStore.SAVINGS))
+            self._store.apply_interest_all()
+            if not self._tx_stack:
+                self._save_data()
+
     def transfer_funds(self, from_acc_num, to_acc_num, amount):
         if from_acc_num in self._accounts and to_acc_num in self._accounts:
-            if self.withdraw(from_acc_num, amount):
-                return self.deposit(to_acc_num, amount)
+            with self.transaction(from_acc_num, to_acc_num):
+                if self.withdraw(from_acc_num, amount) and self.deposit(to_acc_num, amount):
+                    return True
+                raise TransactionAborted
         return False
 
+    @staticmethod
+    def _read_ledger(path):
+        with open(path, 'r', newline='') as f:
+            if path.lower().endswith('.csv'):
+                for line_no, row in enumerate(csv.DictReader(f), start=2):
+                    yield line_no, row
+                return
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError:
+                    yield line_no, None
+
+    def _apply_ledger_row(self, row):
+        try:
+            kind = row['type'].strip().lower()
+            account_number = row['account_number']
+            amount = row['amount']
+            # JSON true/false would otherwise pass as 1/0; CSV amounts arrive as text
+            if isinstance(amount, bool) or not isinstance(amount, (str, int, float)):
+                raise TypeError(amount)
+            exact = Decimal(str(amount).strip())
+        except (KeyError, TypeError, AttributeError, InvalidOperation):
+            return "malformed row"
+        if not isinstance(account_number, str):
+            return "malformed row"
+        # Only whole, positive numbers of cents are applied; 1.005 would otherwise be rounded to a cent silently
+        if not exact.is_finite() or exact <= 0 or exact.normalize().as_tuple().exponent < -2:
+            return "invalid amount"
+        amount = float(exact)
+        if not math.isfinite(amount):
+            return "invalid amount"
+        if account_number not in self._accounts:
+            return "unknown account"
+        if kind == 'deposit':
+            if not self.deposit(account_number, amount):
+                return "invalid amount"
+        elif kind == 'withdraw':
+            if not self.withdraw(account_number, amount):
+                return "insufficient funds"
+        elif kind == 'transfer':
+            to_acc_num = row.get('to_account_number')
+            if not isinstance(to_acc_num, str) or to_acc_num not in self._accounts:
+                return "unknown destination account"
+            if not self.transfer_funds(account_number, to_acc_num, amount):
+                return "insufficient funds"
+        else:
+            return "unknown transaction type"
+        return None
+
+    def import_ledger(self, path, chunk_size=10000, on_reject=None):
+        applied = rejected = 0
+        rows = self._read_ledger(path)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            # Each chunk is one transaction, so it is persisted with a single write. Its accounts are locked up
+            # front in stripe order, so the calls inside never have to wait out of order.
+            account_numbers = {row[field] for _, row in chunk if isinstance(row, dict)
+                               for field in ('account_number', 'to_account_number') if isinstance(row.get(field), str)}
+            with self.transaction(*account_numbers):
+                for line_no, row in chunk:
+                    reason = self._apply_ledger_row(row)
+                    if reason is None:
+                        applied += 1
+                    else:
+                        rejected += 1
+                        if on_reject is not None:
+                            on_reject(line_no, row, reason)
+        return {"applied": applied, "rejected": rejected}
+
 ### Console Interface
     def run(self):
         while True:
-            print("\n1. Add Customer\n2. Create Account\n3. Deposit\n4. Withdraw\n5. Transfer\n6. View Customer Accounts\n7. Apply Interest\n8. Exit")
+            print("\n1. Add Customer\n2. Create Account\n3. Deposit\n4. Withdraw\n5. Transfer\n6. View Customer Accounts\n7. Apply Interest\n8. Import Ledger\n9. Exit")
             choice = input("Enter your choice: ")
             if choice == '1':
                 customer_id = input("Enter customer ID: ")
@@ -328,22 +1271,79 @@ class Bank:
             elif choice == '6':
                 customer_id = input("Enter customer ID: ")
                 if customer_id in self._customers:
-                    for account_number in self._customers[customer_id].account_numbers:
-                        print(self._accounts[account_number].display_details())
+                    for account in self.customer_accounts(customer_id):
+                        print(account.display_details())
+                    print(f"Total Balance: ${self.customer_balance(customer_id):.2f}")
                 else:
                     print("Customer not found.")
             elif choice == '7':
-                for account_number, account in self._accounts.items():
-                    if isinstance(account, SavingsAccount):
-                        account.apply_interest()
-                self._save_data()
+                self.apply_interest_all()
                 print("Interest applied to savings accounts.")
             elif choice == '8':
+                path = input("Enter ledger file path (.csv or .jsonl): ")
+                try:
+                    summary = self.import_ledger(path, on_reject=lambda line_no, row, reason: print(f"Line {line_no} rejected: {reason}"))
+                except FileNotFoundError:
+                    print("Ledger file not found.")
+                    continue
+                print(f"Imported {summary['applied']} transactions, rejected {summary['rejected']}.")
+            elif choice == '9':
                 print("Exiting App...")
+                self.close()
                 break
             else:
                 print("Invalid choice. Please try again.")
 
+### AsyncBank Class
+class AsyncBank:
+    def __init__(self, bank, commit_window=0.002, max_group=1000):
+        self._bank = bank
+        self._commit_window = commit_window
+        self._max_group = max_group
+        # Each operation locks and commits on its own; the ones inside one window share a single durable write
+        self._waiters = []
+        self._flush_handle = None
+
+    async def _submit(self, operation, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        with self._bank._deferred_sync():
+            result = operation(*args, **kwargs)
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        if len(self._waiters) >= self._max_group:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._commit_window, self._flush)
+        await waiter
+        return result
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        waiters = self._waiters
+        self._waiters = []
+        try:
+            self._bank._sync()
+        except Exception as exc:
+            for waiter in waiters:
+                waiter.set_exception(exc)
+        else:
+            for waiter in waiters:
+                waiter.set_result(None)
+
+    async def create_account(self, customer_id, account_type, initial_balance=0.0, **kwargs):
+        return await self._submit(self._bank.create_account, customer_id, account_type, initial_balance, **kwargs)
+
+    async def deposit(self, account_number, amount):
+        return await self._submit(self._bank.deposit, account_number, amount)
+
+    async def withdraw(self, account_number, amount):
+        return await self._submit(self._bank.withdraw, account_number, amount)
+
+    async def transfer_funds(self, from_acc_num, to_acc_num, amount):
+        return await self._submit(self._bank.transfer_funds, from_acc_num, to_acc_num, amount)
+
 if __name__ == "__main__":
-    bank = Bank()
+    bank = Bank(journal_file='bank_journal.jsonl')
     bank.run()
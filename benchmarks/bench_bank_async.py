@@ -0,0 +1,77 @@
+### AsyncBank load generator
+# Sends in-process deposit, withdraw and transfer requests to an AsyncBank at a fixed arrival rate and reports
+# throughput, peak requests in flight and p50/p99 latency, once with group commit and once with every request
+# waiting for its own durable write.
+#
+#   python benchmarks/bench_bank_async.py --requests 20000 --rate 10000
+import argparse
+import asyncio
+import importlib.util
+import os
+import random
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+spec = importlib.util.spec_from_file_location('banking_system', os.path.join(ROOT, 'banking system.py'))
+banking = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(banking)
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+async def request(service, account_numbers, rng, arrival, latencies):
+    kind = rng.random()
+    amount = rng.randint(1, 5000) / 100
+    if kind < 0.4:
+        await service.deposit(rng.choice(account_numbers), amount)
+    elif kind < 0.8:
+        await service.withdraw(rng.choice(account_numbers), amount)
+    else:
+        await service.transfer_funds(*rng.sample(account_numbers, 2), amount)
+    # Measured from the scheduled arrival, so time spent queued behind a busy loop counts too
+    latencies.append(time.perf_counter() - arrival)
+
+async def run(label, args, commit_window, max_group):
+    with tempfile.TemporaryDirectory() as directory:
+        bank = banking.Bank(os.path.join(directory, 'customers.json'), os.path.join(directory, 'accounts.json'),
+                            journal_file=os.path.join(directory, 'journal.jsonl'), compact_every=args.compact_every)
+        bank.add_customer(banking.Customer('load', 'Load Test', 'n/a'))
+        account_numbers = [bank.create_account('load', 'checking', 1000.0).account_number for _ in range(args.accounts)]
+        service = banking.AsyncBank(bank, commit_window=commit_window, max_group=max_group)
+        latencies = []
+        tasks = set()
+        peak = 0
+        rng = random.Random(0)
+        started = time.perf_counter()
+        # Open loop: requests arrive at a fixed rate whether or not earlier ones have finished
+        for number in range(args.requests):
+            arrival = started + number / args.rate
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(request(service, account_numbers, random.Random(rng.random()), arrival, latencies))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            peak = max(peak, len(tasks))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        bank.close()
+    latencies.sort()
+    print(f"{label:<14} {len(latencies) / elapsed:>10.0f} {peak:>10} {percentile(latencies, 0.5) * 1000:>9.2f} "
+          f"{percentile(latencies, 0.99) * 1000:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--rate', type=float, default=10000, help='request arrivals per second')
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--commit-window', type=float, default=0.002, help='seconds')
+    parser.add_argument('--compact-every', type=int, default=100000)
+    args = parser.parse_args()
+    print(f"{'mode':<14} {'req/s':>10} {'in flight':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    asyncio.run(run('group commit', args, args.commit_window, 1000))
+    asyncio.run(run('per request', args, 0, 1))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+### Bank concurrency stress benchmark
+# Runs random transfers from a growing number of teller threads, half of them as multi-call transactions that
+# touch their two accounts in random order. Reports throughput per thread count and checks that money is conserved
+# in memory, in every accounts snapshot written while the run is in flight, and after a reload from disk.
+#
+#   python benchmarks/bench_bank_concurrency.py --threads 1,2,4,8 --ops 4000
+import argparse
+import importlib.util
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+spec = importlib.util.spec_from_file_location('banking_system', os.path.join(ROOT, 'banking system.py'))
+banking = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(banking)
+
+def open_bank(directory, args):
+    return banking.Bank(os.path.join(directory, 'customers.json'), os.path.join(directory, 'accounts.json'),
+                        journal_file=os.path.join(directory, 'journal.jsonl') if args.journal else None,
+                        compact_every=args.compact_every, lock_timeout=args.lock_timeout)
+
+def watch_snapshots(path, expected_cents, stop, report):
+    # Every snapshot is a committed state, so each one must hold exactly the money the run started with
+    while not stop.is_set():
+        try:
+            with open(path) as f:
+                accounts = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+        report['snapshots'] += 1
+        total = sum(banking.to_cents(account['balance']) for account in accounts.values())
+        if total != expected_cents:
+            report['bad_snapshots'] += 1
+        time.sleep(0.005)
+
+def teller(bank, account_numbers, ops, seed, report):
+    rng = random.Random(seed)
+    for _ in range(ops):
+        source, destination = rng.sample(account_numbers, 2)
+        amount = rng.randint(1, 5000) / 100
+        while True:
+            try:
+                if rng.random() < 0.5:
+                    bank.transfer_funds(source, destination, amount)
+                else:
+                    with bank.transaction():
+                        if rng.random() < 0.5:
+                            if not bank.withdraw(source, amount):
+                                raise banking.TransactionAborted
+                            bank.deposit(destination, amount)
+                        else:
+                            bank.deposit(destination, amount)
+                            if not bank.withdraw(source, amount):
+                                raise banking.TransactionAborted
+                break
+            except banking.TransactionConflict:
+                report['conflicts'] += 1
+
+def run(threads, args):
+    with tempfile.TemporaryDirectory() as directory:
+        bank = open_bank(directory, args)
+        bank.add_customer(banking.Customer('stress', 'Stress Test', 'n/a'))
+        account_numbers = [bank.create_account('stress', 'checking', 1000.0).account_number for _ in range(args.accounts)]
+        # Start from a snapshot holding every account; with a journal the last ones created may only be journaled
+        bank._save_data()
+        expected = args.accounts * 100000
+        report = {'snapshots': 0, 'bad_snapshots': 0, 'conflicts': 0}
+        stop = threading.Event()
+        watcher = threading.Thread(target=watch_snapshots, args=(os.path.join(directory, 'accounts.json'), expected, stop, report))
+        watcher.start()
+        workers = [threading.Thread(target=teller, args=(bank, account_numbers, args.ops // threads, seed, report))
+                   for seed in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        watcher.join()
+        in_memory = sum(bank._accounts[account_number].balance_cents for account_number in account_numbers)
+        bank.close()
+        reloaded = open_bank(directory, args)
+        on_disk = sum(reloaded._accounts[account_number].balance_cents for account_number in account_numbers)
+        reloaded.close()
+        conserved = in_memory == expected and on_disk == expected and not report['bad_snapshots']
+        print(f"{threads:>7} {args.ops / elapsed:>10.0f} {report['conflicts']:>9} "
+              f"{report['snapshots']:>9} {report['bad_snapshots']:>13} {'yes' if conserved else 'NO':>9}")
+        return conserved
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', default='1,2,4,8')
+    parser.add_argument('--ops', type=int, default=4000, help='operations per run, split across the threads')
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--journal', action='store_true', help='journal mutations instead of rewriting the JSON files')
+    parser.add_argument('--compact-every', type=int, default=200)
+    parser.add_argument('--lock-timeout', type=float, default=0.05)
+    args = parser.parse_args()
+    print(f"{'threads':>7} {'ops/s':>10} {'conflicts':>9} {'snapshots':>9} {'bad snapshots':>13} {'conserved':>9}")
+    ok = all([run(int(threads), args) for threads in args.threads.split(',')])
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+### Shared inventory concurrency benchmark
+# Many cart sessions on one InventoryService add items from worker threads until the stock runs out. Reports
+# add-to-cart attempts per second and checks that no product was sold beyond its stock: every unit is either still
+# on the shelf or in exactly one cart.
+#
+#   python benchmarks/bench_cart_concurrency.py --threads 1 2 4 8 16 --attempts 20000
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import shopping_cart as cart_module
+
+def write_catalog(path, products, stock):
+    with open(path, 'w') as f:
+        for number in range(products):
+            f.write(json.dumps({'type': 'product', 'product_id': f"P{number:05d}", 'name': f"Item {number}",
+                                'price': 1.0 + number % 50, 'quantity_available': stock}) + '\n')
+
+def run(threads, args, through_cart):
+    with tempfile.TemporaryDirectory() as directory:
+        catalog_file = os.path.join(directory, 'products.jsonl')
+        write_catalog(catalog_file, args.products, args.stock)
+        inventory = cart_module.InventoryService(catalog_file, os.path.join(directory, 'stock.jsonl'),
+                                                 order_file=os.path.join(directory, 'orders.jsonl'))
+        product_ids = [f"P{number:05d}" for number in range(args.products)]
+        # A few hot products take most of the traffic, so threads collide on the same stock
+        weights = [1 / (rank + 1) for rank in range(args.products)]
+        sessions = [f"s{worker}-{number}" for worker in range(threads) for number in range(args.sessions)]
+        carts = {session: inventory.get_cart(session, os.path.join(directory, f"cart_{session}.json"))
+                 for session in sessions}
+        added = [0] * threads
+        per_thread = args.attempts // threads
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(index):
+            rng = random.Random(index)
+            mine = sessions[index * args.sessions:(index + 1) * args.sessions]
+            picks = rng.choices(product_ids, weights, k=per_thread)
+            barrier.wait()
+            for product_id in picks:
+                session = rng.choice(mine)
+                if through_cart:
+                    ok = carts[session].add_item(product_id, 1)
+                else:
+                    ok = inventory.reserve(session, product_id, 1) is not None
+                added[index] += bool(ok)
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        oversold = 0
+        held = 0
+        for product_id in product_ids:
+            in_carts = sum(inventory.reserved(session, product_id) for session in sessions)
+            on_shelf = inventory.get_product(product_id).quantity_available
+            held += in_carts
+            if on_shelf < 0 or on_shelf + in_carts != args.stock:
+                oversold += 1
+        if through_cart:
+            held_in_lines = sum(item.quantity for cart in carts.values() for item in cart._items.values())
+            if held_in_lines != held:
+                oversold += 1
+        inventory.close()
+    label = 'add_item' if through_cart else 'reserve'
+    print(f"{label:<9} {threads:>7} {per_thread * threads / elapsed:>12.0f} {sum(added):>8} {held:>8} {oversold:>9}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--attempts', type=int, default=20000, help='add-to-cart attempts per row, split across threads')
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--stock', type=int, default=25, help='units of each product')
+    parser.add_argument('--sessions', type=int, default=4, help='cart sessions per thread')
+    args = parser.parse_args()
+    print(f"{'path':<9} {'threads':>7} {'attempts/s':>12} {'added':>8} {'in carts':>8} {'oversold':>9}")
+    for through_cart in (False, True):
+        for threads in args.threads:
+            run(threads, args, through_cart)
+
+if __name__ == '__main__':
+    main()
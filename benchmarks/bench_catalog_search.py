@@ -0,0 +1,109 @@
+### Catalog search benchmark
+# Loads a synthetic catalog of plain, physical and digital products into an InventoryService and times
+# search_products against a full scan of the catalog, e.g. "digital products under $20 in stock".
+#
+#   python benchmarks/bench_catalog_search.py --skus 1000000 --limit 20
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import shopping_cart as cart_module
+
+ADJECTIVES = ('red blue green black white wireless portable compact deluxe classic smart organic vintage '
+              'ultra mini pro travel kids outdoor premium').split()
+NOUNS = ('lamp chair desk headphones speaker backpack bottle kettle blender jacket shoes watch camera novel ebook '
+         'course album font template plugin game subscription poster mug rug').split()
+
+def write_catalog(path, skus, seed):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for number in range(skus):
+            kind = rng.random()
+            record = {'product_id': f"SKU{number:07d}",
+                      'name': f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS).title()} {number % 1000}",
+                      'price': round(rng.uniform(0.5, 500.0), 2),
+                      # About a tenth of the catalog is sold out
+                      'quantity_available': 0 if rng.random() < 0.1 else rng.randint(1, 100)}
+            if kind < 0.6:
+                record.update(type='physical', weight=round(rng.uniform(0.05, 40.0), 2))
+            elif kind < 0.9:
+                record.update(type='digital', download_link=f"https://example.com/d/{number}")
+            else:
+                record.update(type='product')
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+def full_scan(catalog, text=None, product_type=None, weight_bucket=None, in_stock_only=False,
+              min_price=None, max_price=None, limit=None):
+    # What answering the query takes without the index: test every product, then sort the matches by price
+    tokens = set(cart_module.CatalogIndex.tokenize(text)) if text else set()
+    product_class = cart_module.InventoryService.PRODUCT_TYPES.get(product_type)
+    matches = []
+    for product in catalog.values():
+        if product_class is not None and type(product) is not product_class:
+            continue
+        if in_stock_only and product.quantity_available <= 0:
+            continue
+        if min_price is not None and product.price < min_price:
+            continue
+        if max_price is not None and product.price > max_price:
+            continue
+        if weight_bucket and not (isinstance(product, cart_module.PhysicalProduct)
+                                  and cart_module.CatalogIndex.weight_bucket(product.weight) == weight_bucket):
+            continue
+        if tokens and not tokens <= set(cart_module.CatalogIndex.tokenize(product.name)):
+            continue
+        matches.append((product.price, product.product_id))
+    matches.sort()
+    return matches if limit is None else matches[:limit]
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+QUERIES = (
+    ('digital under $20 in stock', dict(product_type='digital', max_price=20.0, in_stock_only=True)),
+    ('"wireless headphones"', dict(text='wireless headphones')),
+    ('"ebook" digital in stock', dict(text='ebook', product_type='digital', in_stock_only=True)),
+    ('physical 20 kg and over', dict(product_type='physical', weight_bucket='20 kg and over')),
+    ('$100-$101', dict(min_price=100.0, max_price=101.0)),
+    ('in stock, any', dict(in_stock_only=True)),
+)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--skus', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=20, help='0 returns every match')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    limit = args.limit or None
+    with tempfile.TemporaryDirectory() as directory:
+        catalog_file = os.path.join(directory, 'products.jsonl')
+        write_catalog(catalog_file, args.skus, args.seed)
+        started = time.perf_counter()
+        inventory = cart_module.InventoryService(catalog_file, os.path.join(directory, 'stock.jsonl'),
+                                                 order_file=os.path.join(directory, 'orders.jsonl'))
+        print(f"loaded and indexed {args.skus} SKUs in {time.perf_counter() - started:.1f}s")
+        catalog = inventory._catalog
+        print(f"{'query':<30} {'index ms':>9} {'scan ms':>9} {'hits':>8}")
+        for label, query in QUERIES:
+            index_time, found = timed(lambda: inventory.search_products(limit=limit, **query), args.repeat)
+            scan_time, scanned = timed(lambda: full_scan(catalog, limit=limit, **query), args.repeat)
+            if [product.product_id for product in found] != [product_id for _, product_id in scanned]:
+                raise RuntimeError(f"index and scan disagree on {label}")
+            print(f"{label:<30} {index_time * 1000:>9.2f} {scan_time * 1000:>9.1f} {len(found):>8}")
+        inventory.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+### Library batch checkout benchmark
+# Borrows and returns the same number of books through borrow_books/return_books at growing batch sizes, next to
+# one borrow_book/return_book call per book, and reports the cost per book. A batch pays for one storage commit.
+#
+#   python benchmarks/bench_library_batch.py --items 2000 --sizes 1 5 20 100
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import library_management as library_module
+
+def build_library(directory, books):
+    library = library_module.Library(os.path.join(directory, 'books.json'), os.path.join(directory, 'users.json'))
+    for number in range(books):
+        library.add_book(library_module.Book(f"Title {number}", f"Author {number % 97}", f"978{number:010d}"))
+    library.register_user(library_module.User('Kiosk', 'kiosk'))
+    return library
+
+def run_single(library, isbns, size):
+    for start in range(0, len(isbns), size):
+        for isbn in isbns[start:start + size]:
+            library.borrow_book(isbn, 'kiosk')
+        for isbn in isbns[start:start + size]:
+            library.return_book(isbn, 'kiosk')
+
+def run_batch(library, isbns, size):
+    for start in range(0, len(isbns), size):
+        borrowed, results = library.borrow_books('kiosk', isbns[start:start + size])
+        returned, _ = library.return_books('kiosk', isbns[start:start + size])
+        if not (borrowed and returned):
+            raise RuntimeError(f"batch failed: {results}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=2000, help='books borrowed and returned per row')
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 5, 10, 20, 50, 100, 200])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        library = build_library(directory, args.books)
+        all_isbns = list(library._books)
+        print(f"{'batch size':>10} {'single us/book':>15} {'batch us/book':>14} {'speedup':>8}")
+        for size in args.sizes:
+            isbns = rng.sample(all_isbns, min(args.items, len(all_isbns)))
+            timings = []
+            for run in (run_single, run_batch):
+                started = time.perf_counter()
+                run(library, isbns, size)
+                timings.append((time.perf_counter() - started) / (2 * len(isbns)))
+            single, batch = timings
+            print(f"{size:>10} {single * 1e6:>15.1f} {batch * 1e6:>14.1f} {single / batch:>8.1f}x")
+        library.close()
+
+if __name__ == '__main__':
+    main()
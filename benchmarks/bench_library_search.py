@@ -0,0 +1,90 @@
+### Library search benchmark
+# Builds a synthetic catalog and times Library.search_book against the linear substring scan it replaced,
+# for rare, common, very short and ISBN-prefix queries.
+#
+#   python benchmarks/bench_library_search.py --books 300000 --limit 10
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import library_management as library_module
+
+WORDS = ('the of and a to in is you that it he was for on are as with his they i at be this have from or one had by '
+         'word but not what all were we when your can said there use an each which she do how their if will up other '
+         'about out many then them these so some her would make like him into time has look two more write go see '
+         'number no way could people my than first water been call who oil its now find long down day did get come '
+         'made may part night dragon garden winter secret house river shadow stone king queen war peace love dark '
+         'light island empire ghost fire city road storm wolf silver golden lost last journey sea mountain').split()
+FIRST_NAMES = ('harry james mary john patricia robert jennifer michael linda william elizabeth david barbara richard '
+               'susan joseph jessica thomas sarah charles karen daniel nancy matthew lisa anthony betty mark helen '
+               'donald sandra steven ashley paul kimberly andrew emily joshua donna kenneth michelle kevin carol brian '
+               'amanda george melissa timothy deborah ronald stephanie edward rebecca jason sharon jeffrey laura ryan').split()
+LAST_NAMES = ('smith johnson williams brown jones garcia miller davis rodriguez martinez hernandez lopez gonzalez '
+              'wilson anderson thomas taylor moore jackson martin lee perez thompson white harris sanchez clark '
+              'ramirez lewis robinson walker young allen king wright scott torres nguyen hill flores green adams '
+              'nelson baker hall rivera campbell mitchell carter roberts potter tolkien austen orwell').split()
+
+def synthetic_books(count, seed):
+    rng = random.Random(seed)
+    # A long tail of made-up words alongside the common ones, drawn with a Zipf-like skew
+    vocabulary = list(WORDS) + [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 10)))
+                                for _ in range(20000)]
+    cumulative, total = [], 0.0
+    for rank in range(len(vocabulary)):
+        total += 1 / (rank + 1)
+        cumulative.append(total)
+    isbns = rng.sample(range(10 ** 10), count)
+    for number in isbns:
+        title = ' '.join(rng.choices(vocabulary, cum_weights=cumulative, k=rng.randint(2, 6))).title()
+        author = f"{rng.choice(FIRST_NAMES).title()} {rng.choice(LAST_NAMES).title()}"
+        yield library_module.Book(title, author, f"978{number:010d}")
+
+def linear_search(books, query):
+    # The search_book implementation before the index
+    query_lower = query.lower()
+    return [book for book in books.values()
+            if query_lower in book.title.lower() or query_lower in book.author.lower() or query_lower in book.isbn]
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--books', type=int, default=300000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('queries', nargs='*', default=['harry', 'a', '978', 'the', 'dragon', 'potter', 'har',
+                                                        'harry potter', 'the dark king', 'zzzzqx'])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        storage = library_module.SQLiteStorage(os.path.join(directory, 'library.db'))
+        library = library_module.Library(os.path.join(directory, 'books.json'), os.path.join(directory, 'users.json'),
+                                         storage=storage)
+        started = time.perf_counter()
+        for book in synthetic_books(args.books, args.seed):
+            library._books[book.isbn] = book
+            library._index.add(book)
+        print(f"indexed {args.books} books in {time.perf_counter() - started:.1f}s")
+        sample = next(iter(library._books))
+        print(f"{'query':<16} {'index ms':>9} {'scan ms':>9} {'index hits':>10} {'scan hits':>10}")
+        for query in args.queries + [sample[:8], sample]:
+            index_time, found = timed(lambda: library.search_book(query, limit=args.limit), args.repeat)
+            scan_time, scanned = timed(lambda: linear_search(library._books, query), args.repeat)
+            print(f"{query:<16} {index_time * 1000:>9.3f} {scan_time * 1000:>9.1f} {len(found):>10} {len(scanned):>10}")
+        library.close()
+
+if __name__ == '__main__':
+    main()
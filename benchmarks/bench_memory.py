@@ -0,0 +1,96 @@
+### Model memory benchmark
+# Measures bytes per record with tracemalloc for every model class in library_management.py, shopping_cart.py and
+# banking system.py, as declared with __slots__ and as the same fields held in a per-instance __dict__ like the
+# classes had before. Field values are the same in both columns; only the instance layout differs.
+#
+#   python benchmarks/bench_memory.py --records 100000
+import argparse
+import gc
+import importlib.util
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import library_management as library_module
+import shopping_cart as cart_module
+spec = importlib.util.spec_from_file_location('banking_system', os.path.join(ROOT, 'banking system.py'))
+banking = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(banking)
+
+NOW = datetime(2024, 1, 1)
+
+MODELS = (
+    ('library_management', 'Book', lambda n: library_module.Book(f"Title {n}", f"Author {n}", f"978{n:010d}")),
+    ('library_management', 'User', lambda n: library_module.User(f"Reader {n}", f"U{n:07d}")),
+    ('library_management', 'Loan', lambda n: library_module.Loan(f"978{n:010d}-1", f"978{n:010d}", f"U{n:07d}",
+                                                                 NOW, NOW + timedelta(days=14))),
+    ('shopping_cart', 'Product', lambda n: cart_module.Product(f"P{n:07d}", f"Item {n}", 1.0 + n % 100, n % 50)),
+    ('shopping_cart', 'PhysicalProduct', lambda n: cart_module.PhysicalProduct(f"P{n:07d}", f"Item {n}", 1.0 + n % 100,
+                                                                               n % 50, 0.5 + n % 20)),
+    ('shopping_cart', 'DigitalProduct', lambda n: cart_module.DigitalProduct(f"P{n:07d}", f"Item {n}", 1.0 + n % 100,
+                                                                             n % 50, f"https://example.com/d/{n}")),
+    ('shopping_cart', 'CartItem', lambda n: cart_module.CartItem(SHARED_PRODUCT, 1 + n % 5)),
+    ('banking system', 'Customer', lambda n: banking.Customer(f"C{n:07d}", f"Customer {n}", f"{n} Main St")),
+    ('banking system', 'SavingsAccount', lambda n: banking.SavingsAccount(f"A{n:07d}", f"C{n:07d}", n % 1000)),
+    ('banking system', 'CheckingAccount', lambda n: banking.CheckingAccount(f"A{n:07d}", f"C{n:07d}", n % 1000, 100.0)),
+)
+
+SHARED_PRODUCT = cart_module.Product('P0', 'Shared', 1.0, 10)
+
+def slot_names(cls):
+    names = []
+    for klass in reversed(cls.__mro__):
+        slots = vars(klass).get('__slots__', ())
+        names.extend([slots] if isinstance(slots, str) else slots)
+    return names
+
+def measure(build, count, baseline=0.0):
+    # Bytes still allocated per record while the built records are alive, less baseline for the list holding them
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build(count)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del records
+    return allocated / count - baseline
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+    list_slot = measure(lambda count: [None for _ in range(count)], args.records)
+    print(f"{'module':<20} {'model':<16} {'__dict__ B':>10} {'__slots__ B':>11} {'saved':>7}")
+    for module_name, class_name, factory in MODELS:
+        records = [factory(n) for n in range(args.records)]
+        cls = type(records[0])
+        names = slot_names(cls)
+        if '__dict__' in names or not hasattr(records[0], '__slots__'):
+            raise RuntimeError(f"{class_name} has no __slots__")
+        plain = type(f"{class_name}WithDict", (), {})
+
+        def copies(count, target):
+            # Rebuilds the records field by field, in __init__ order, so the field values are shared and only the
+            # instance layout is measured
+            built = []
+            for record in records[:count]:
+                copy = object.__new__(target)
+                for name in names:
+                    object.__setattr__(copy, name, getattr(record, name))
+                built.append(copy)
+            return built
+
+        slots_total = measure(lambda count: [factory(n) for n in range(count)], args.records, list_slot)
+        slots_instance = measure(lambda count: copies(count, cls), args.records, list_slot)
+        dict_instance = measure(lambda count: copies(count, plain), args.records, list_slot)
+        # A whole record is its field values plus the instance holding them; only the instance differs
+        dict_total = slots_total - slots_instance + dict_instance
+        print(f"{module_name:<20} {class_name:<16} {dict_total:>10.0f} {slots_total:>11.0f} "
+              f"{1 - slots_total / dict_total:>6.0%}")
+        del records
+
+if __name__ == '__main__':
+    main()
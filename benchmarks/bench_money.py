@@ -0,0 +1,107 @@
+### Money representation benchmark
+# Runs the same deposit/withdraw/interest loop over float dollars, Decimal dollars and integer cents and reports
+# throughput and how far each ends from the exact result. The int-cents row also runs through SavingsAccount itself.
+#
+#   python benchmarks/bench_money.py --ops 1000000
+import argparse
+import importlib.util
+import os
+import random
+import time
+from decimal import ROUND_HALF_EVEN, Decimal
+from fractions import Fraction
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+spec = importlib.util.spec_from_file_location('banking_system', os.path.join(ROOT, 'banking system.py'))
+banking = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(banking)
+
+CENT = Decimal('0.01')
+
+def workload(ops, seed):
+    # Amounts are whole cents as a customer would type them; every 1000th step pays interest instead
+    rng = random.Random(seed)
+    return [('interest', None) if step % 1000 == 999 else (rng.choice(('deposit', 'withdraw')), rng.randint(1, 100000))
+            for step in range(ops)]
+
+def exact_cents(steps, rate):
+    # Ground truth with exact fractions, interest rounded half-even to the cent like the other paths
+    balance = Fraction(0)
+    for kind, cents in steps:
+        if kind == 'deposit':
+            balance += cents
+        elif kind == 'withdraw':
+            if cents <= balance:
+                balance -= cents
+        else:
+            balance += round(balance * Fraction(rate))
+    return balance
+
+def run_float(steps, rate):
+    balance = 0.0
+    for kind, cents in steps:
+        if kind == 'deposit':
+            balance += cents / 100
+        elif kind == 'withdraw':
+            amount = cents / 100
+            if amount <= balance:
+                balance -= amount
+        else:
+            balance += balance * rate  # as Account did before balances were held in cents
+    return round(balance * 100)
+
+def run_decimal(steps, rate):
+    balance = Decimal(0)
+    decimal_rate = Decimal(rate)
+    for kind, cents in steps:
+        if kind == 'deposit':
+            balance += Decimal(cents) / 100
+        elif kind == 'withdraw':
+            amount = Decimal(cents) / 100
+            if amount <= balance:
+                balance -= amount
+        else:
+            balance += (balance * decimal_rate).quantize(CENT, rounding=ROUND_HALF_EVEN)
+    return int(balance * 100)
+
+def run_int_cents(steps, rate):
+    balance = 0
+    for kind, cents in steps:
+        if kind == 'deposit':
+            balance += cents
+        elif kind == 'withdraw':
+            if cents <= balance:
+                balance -= cents
+        else:
+            balance += round(balance * rate)
+    return balance
+
+def run_account(steps, rate):
+    account = banking.SavingsAccount('bench', 'bench', 0, interest_rate=rate)
+    for kind, cents in steps:
+        if kind == 'deposit':
+            account.deposit(cents / 100)
+        elif kind == 'withdraw':
+            account.withdraw(cents / 100)
+        else:
+            account.apply_interest()
+    return account.balance_cents
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ops', type=int, default=1000000)
+    parser.add_argument('--rate', type=float, default=0.0001, help='interest per interest step, e.g. a daily rate')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    steps = workload(args.ops, args.seed)
+    expected = exact_cents(steps, args.rate)
+    print(f"{'representation':<26} {'ops/s':>12} {'cents off':>10}")
+    for label, run in (('float dollars', run_float), ('Decimal dollars', run_decimal), ('int cents', run_int_cents),
+                       ('int cents (SavingsAccount)', run_account)):
+        started = time.perf_counter()
+        result = run(steps, args.rate)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<26} {len(steps) / elapsed:>12.0f} {int(result - expected):>10}")
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,104 @@
+import heapq
 import json
 import os
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import groupby, islice
+from operator import itemgetter
+
+# JSONStream Class
+# Decodes one JSON value at a time from a file read in fixed-size chunks, so a large import never sits in memory whole
+class JSONStream:
+    def __init__(self, f, chunk_size=1 << 16):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._consumed = 0
+        self._eof = False
+
+    @property
+    def offset(self):
+        return self._consumed + self._position
+
+    def _fill(self):
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._consumed += self._position
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def peek(self):
+        # Next non-whitespace character, or '' at the end of the input
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in ' \t\r\n':
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.offset}")
+        self._position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except ValueError:
+                if self._eof or not self._fill():
+                    raise
+                continue
+            # A number or literal that ends the buffer may continue in the next chunk
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._position = end
+            return value
+
+def iter_json_records(path, on_progress=None, progress_every=10000):
+    # Accepts a JSON array or JSON Lines; on_progress(path, records, offset) reports how far the load has got
+    with open(path, 'r') as f:
+        stream = JSONStream(f)
+        count = 0
+        is_array = stream.peek() == '['
+        if is_array:
+            stream.expect('[')
+        while stream.peek() not in ('', ']'):
+            yield stream.value()
+            count += 1
+            if is_array and stream.peek() == ',':
+                stream.expect(',')
+            if on_progress and count % progress_every == 0:
+                on_progress(path, count, stream.offset)
+        if is_array:
+            stream.expect(']')
+        if on_progress:
+            on_progress(path, count, stream.offset)
 
 # Book Class
 class Book:
-    def __init__(self, title: str, author: str, isbn: str):
+    __slots__ = ('_title', '_author', '_isbn', '_copies', '_available')
+
+    def __init__(self, title: str, author: str, isbn: str, copies: int = 1):
         self._title = title
         self._author = author
         self._isbn = isbn
-        self._is_borrowed = False
+        self._copies = {}  # barcode: is_borrowed
+        self._available = 0
+        for _ in range(copies):
+            self.add_copy()
 
     @property
     def title(self):
@@ -21,31 +112,70 @@ class Book:
     def isbn(self):
         return self._isbn
 
+    @property
+    def copies(self):
+        return dict(self._copies)
+
+    @property
+    def total_copies(self):
+        return len(self._copies)
+
+    @property
+    def available_copies(self):
+        return self._available
+
     @property
     def is_borrowed(self):
-        return self._is_borrowed
+        return self._available == 0
 
     @is_borrowed.setter
     def is_borrowed(self, value):
         if isinstance(value, bool):
-            self._is_borrowed = value
+            for barcode in self._copies:
+                self._copies[barcode] = value
+            self._available = 0 if value else len(self._copies)
         else:
             raise ValueError("is_borrowed must be a boolean.")
 
+    def add_copy(self, barcode: str = None):
+        if barcode is None:
+            number = len(self._copies) + 1
+            barcode = f"{self._isbn}-{number}"
+            while barcode in self._copies:
+                number += 1
+                barcode = f"{self._isbn}-{number}"
+        if barcode in self._copies:
+            return None
+        self._copies[barcode] = False
+        self._available += 1
+        return barcode
+
     def borrow(self):
-        if not self._is_borrowed:
-            self._is_borrowed = True
-            return True
-        return False
+        if not self._available:
+            return None
+        for barcode, borrowed in self._copies.items():
+            if not borrowed:
+                self._copies[barcode] = True
+                self._available -= 1
+                return barcode
+        return None
 
-    def return_book(self):
-        if self._is_borrowed:
-            self._is_borrowed = False
+    def return_book(self, barcode: str = None):
+        if barcode is None:
+            barcode = next((b for b, borrowed in self._copies.items() if borrowed), None)
+        if self._copies.get(barcode):
+            self._copies[barcode] = False
+            self._available += 1
             return True
         return False
 
     def __str__(self):
-        status = "Borrowed" if self._is_borrowed else "Available"
+        if not self._available:
+            status = "Borrowed"
+        elif len(self._copies) > 1:
+            status = f"Available ({self._available}/{len(self._copies)} copies)"
+        else:
+            status = "Available"
         return f"Title: {self._title}, Author: {self._author}, ISBN: {self._isbn}, Status: {status}"
 
     def to_dict(self):
@@ -53,15 +183,18 @@ class Book:
             'title': self._title,
             'author': self._author,
             'isbn': self._isbn,
-            'is_borrowed': self._is_borrowed
+            'is_borrowed': self.is_borrowed,
+            'copies': dict(self._copies)
         }
 
 # User Class
 class User:
+    __slots__ = ('_name', '_user_id', '_borrowed_books_isbns')
+
     def __init__(self, name: str, user_id: str):
         self._name = name
         self._user_id = user_id
-        self._borrowed_books_isbns = []
+        self._borrowed_books_isbns = {}  # insertion-ordered set: isbn -> None
 
     @property
     def name(self):
@@ -75,13 +208,18 @@ class User:
     def borrowed_books_isbns(self):
         return list(self._borrowed_books_isbns)
 
+    @property
+    def borrowed_count(self):
+        return len(self._borrowed_books_isbns)
+
+    def has_borrowed(self, isbn: str):
+        return isbn in self._borrowed_books_isbns
+
     def add_borrowed_book_isbn(self, isbn: str):
-        if isbn not in self._borrowed_books_isbns:
-            self._borrowed_books_isbns.append(isbn)
+        self._borrowed_books_isbns.setdefault(isbn)
 
     def remove_borrowed_book_isbn(self, isbn: str):
-        if isbn in self._borrowed_books_isbns:
-            self._borrowed_books_isbns.remove(isbn)
+        self._borrowed_books_isbns.pop(isbn, None)
 
     def __str__(self):
         return f"User: {self._name} (ID: {self._user_id}), Borrowed Books: {len(self._borrowed_books_isbns)}"
@@ -90,55 +228,636 @@ class User:
         return {
             'name': self._name,
             'user_id': self._user_id,
-            'borrowed_books_isbns': self._borrowed_books_isbns
+            'borrowed_books_isbns': list(self._borrowed_books_isbns)
         }
 
+# Loan Class
+class Loan:
+    __slots__ = ('_barcode', '_isbn', '_user_id', '_borrowed_at', '_due_at', '_renewals')
+
+    def __init__(self, barcode: str, isbn: str, user_id: str, borrowed_at: datetime, due_at: datetime, renewals: int = 0):
+        self._barcode = barcode
+        self._isbn = isbn
+        self._user_id = user_id
+        self._borrowed_at = borrowed_at
+        self._due_at = due_at
+        self._renewals = renewals
+
+    @property
+    def barcode(self):
+        return self._barcode
+
+    @property
+    def isbn(self):
+        return self._isbn
+
+    @property
+    def user_id(self):
+        return self._user_id
+
+    @property
+    def borrowed_at(self):
+        return self._borrowed_at
+
+    @property
+    def due_at(self):
+        return self._due_at
+
+    @property
+    def renewals(self):
+        return self._renewals
+
+    def is_overdue(self, now: datetime):
+        return self._due_at < now
+
+    def renew(self, period: timedelta):
+        self._due_at += period
+        self._renewals += 1
+
+    def __str__(self):
+        return (f"ISBN: {self._isbn}, Copy: {self._barcode}, User ID: {self._user_id}, Borrowed: {self._borrowed_at:%Y-%m-%d}, "
+                f"Due: {self._due_at:%Y-%m-%d}, Renewals: {self._renewals}")
+
+    def to_dict(self):
+        return {
+            'barcode': self._barcode,
+            'isbn': self._isbn,
+            'user_id': self._user_id,
+            'borrowed_at': self._borrowed_at.isoformat(),
+            'due_at': self._due_at.isoformat(),
+            'renewals': self._renewals
+        }
+
+# PrefixTrie Class
+class PrefixTrie:
+    def __init__(self):
+        self._root = {}  # char: child node; the '' key holds the values stored at that node
+
+    def add(self, key: str, value):
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault('', set()).add(value)
+
+    def remove(self, key: str, value):
+        path = []
+        node = self._root
+        for char in key:
+            child = node.get(char)
+            if child is None:
+                return
+            path.append((node, char))
+            node = child
+        values = node.get('')
+        if values is None:
+            return
+        values.discard(value)
+        if not values:
+            del node['']
+        for parent, char in reversed(path):
+            if parent[char]:
+                break
+            del parent[char]
+
+    def _node(self, key: str):
+        node = self._root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node
+
+    def exact(self, key: str):
+        node = self._node(key)
+        return set() if node is None else node.get('', set())
+
+    def has_prefix(self, prefix: str):
+        return self._node(prefix) is not None
+
+    def value_sets(self, prefix: str):
+        # The value set of every key under the prefix, so callers can union them a set at a time
+        node = self._node(prefix)
+        stack = [] if node is None else [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == '':
+                    yield child
+                else:
+                    stack.append(child)
+
+    def sorted_values(self, prefix: str):
+        # Values under the prefix in key order, produced lazily so a caller that needs the first few stops early
+        node = self._node(prefix)
+        stack = [] if node is None else [node]
+        while stack:
+            node = stack.pop()
+            yield from sorted(node.get('', ()))
+            stack.extend(node[char] for char in sorted(node, reverse=True) if char)
+
+# BookIndex Class
+class BookIndex:
+    TITLE_EXACT, TITLE_PREFIX = 4, 2
+    AUTHOR_EXACT, AUTHOR_PREFIX = 3, 1
+    ISBN_PREFIX = 5
+
+    def __init__(self):
+        self._titles = PrefixTrie()   # title token -> isbns
+        self._authors = PrefixTrie()  # author token -> isbns
+        self._isbns = PrefixTrie()    # isbn -> isbn
+
+    @staticmethod
+    def tokenize(text: str):
+        return set(re.findall(r"\w+", text.lower()))
+
+    def add(self, book):
+        for token in self.tokenize(book.title):
+            self._titles.add(token, book.isbn)
+        for token in self.tokenize(book.author):
+            self._authors.add(token, book.isbn)
+        self._isbns.add(book.isbn.lower(), book.isbn)
+
+    def remove(self, book):
+        for token in self.tokenize(book.title):
+            self._titles.remove(token, book.isbn)
+        for token in self.tokenize(book.author):
+            self._authors.remove(token, book.isbn)
+        self._isbns.remove(book.isbn.lower(), book.isbn)
+
+    def _token_tiers(self, token: str):
+        # The eight ways a single token can match, highest score first. Each tier is built only when the search
+        # reaches it, and the prefix sets only when a tier needs them
+        title_exact, author_exact = self._titles.exact(token), self._authors.exact(token)
+        title_prefix = lru_cache(maxsize=None)(lambda: set().union(*self._titles.value_sets(token)) - title_exact)
+        author_prefix = lru_cache(maxsize=None)(lambda: set().union(*self._authors.value_sets(token)) - author_exact)
+        tiers = [
+            (self.TITLE_EXACT + self.AUTHOR_EXACT, lambda: title_exact & author_exact),
+            (self.TITLE_EXACT + self.AUTHOR_PREFIX, lambda: title_exact and title_exact & author_prefix()),
+            (self.TITLE_PREFIX + self.AUTHOR_EXACT, lambda: author_exact and title_prefix() & author_exact),
+            (self.TITLE_EXACT, lambda: title_exact and title_exact - author_exact - author_prefix()),
+            (self.AUTHOR_EXACT, lambda: author_exact and author_exact - title_exact - title_prefix()),
+            (self.TITLE_PREFIX + self.AUTHOR_PREFIX, lambda: title_prefix() & author_prefix()),
+            (self.TITLE_PREFIX, lambda: title_prefix() - author_exact - author_prefix()),
+            (self.AUTHOR_PREFIX, lambda: author_prefix() - title_exact - title_prefix()),
+        ]
+        return sorted(tiers, key=lambda tier: -tier[0])
+
+    def _scored_tiers(self, tokens):
+        # Several tokens: only books every token matches can score, so intersect first and score what is left
+        matches = []
+        for token in tokens:
+            title_any = set().union(*self._titles.value_sets(token))
+            author_any = set().union(*self._authors.value_sets(token))
+            matches.append((self._titles.exact(token), title_any, self._authors.exact(token), author_any))
+        candidates = set.intersection(*sorted((title_any | author_any for _, title_any, _, author_any in matches), key=len))
+        scored = {}
+        for isbn in candidates:
+            score = 0
+            for title_exact, title_any, author_exact, author_any in matches:
+                if isbn in title_exact:
+                    score += self.TITLE_EXACT
+                elif isbn in title_any:
+                    score += self.TITLE_PREFIX
+                if isbn in author_exact:
+                    score += self.AUTHOR_EXACT
+                elif isbn in author_any:
+                    score += self.AUTHOR_PREFIX
+            scored.setdefault(score, set()).add(isbn)
+        return [(score, lambda isbns=isbns: isbns) for score, isbns in sorted(scored.items(), reverse=True)]
+
+    def _with_isbn_matches(self, tiers, isbn_query: str):
+        # An ISBN prefix match adds ISBN_PREFIX to whatever the tokens scored; ISBNs no token matched are walked
+        # in order straight from the trie
+        token_matches = set()
+        boosted = []
+        for score, isbns in tiers:
+            isbns = isbns()
+            token_matches |= isbns
+            hits = {isbn for isbn in isbns if isbn.lower().startswith(isbn_query)}
+            boosted.append((score + self.ISBN_PREFIX, lambda hits=hits: hits))
+            boosted.append((score, lambda rest=isbns - hits: rest))
+        isbn_only = (isbn for isbn in self._isbns.sorted_values(isbn_query) if isbn not in token_matches)
+        boosted.append((self.ISBN_PREFIX, isbn_only))
+        return sorted(boosted, key=lambda tier: -tier[0])
+
+    @staticmethod
+    def _top(tiers, limit):
+        # A tier is a function returning a set of ISBNs, or an iterator already in ISBN order. Tiers sharing a score
+        # are merged, and only the smallest ISBNs a limited search still needs are ever sorted
+        results = []
+        for _, group in groupby(tiers, key=itemgetter(0)):
+            needed = None if limit is None else limit - len(results)
+            if needed is not None and needed <= 0:
+                break
+            runs = []
+            for _, isbns in group:
+                if callable(isbns):
+                    isbns = isbns()
+                    isbns = sorted(isbns) if needed is None else heapq.nsmallest(needed, isbns)
+                runs.append(isbns)
+            results.extend(islice(heapq.merge(*runs), needed))
+        return results
+
+    def search(self, query: str, limit=None):
+        # Every query token must prefix-match a title or author token; ISBN prefixes match on their own.
+        # Results are ranked by score, then ISBN
+        tokens = self.tokenize(query)
+        if len(tokens) == 1:
+            tiers = self._token_tiers(next(iter(tokens)))
+        else:
+            tiers = self._scored_tiers(tokens) if tokens else []
+        isbn_query = query.strip().lower()
+        if isbn_query and self._isbns.has_prefix(isbn_query):
+            tiers = self._with_isbn_matches(tiers, isbn_query)
+        return self._top(tiers, limit)
+
+# LibraryStorage Class (Abstract)
+class LibraryStorage(ABC):
+    @abstractmethod
+    def load_books(self):
+        pass
+
+    @abstractmethod
+    def load_users(self):
+        pass
+
+    @abstractmethod
+    def save_book(self, book: Book):
+        pass
+
+    @abstractmethod
+    def delete_book(self, isbn: str):
+        pass
+
+    @abstractmethod
+    def save_user(self, user: User):
+        pass
+
+    @abstractmethod
+    def delete_user(self, user_id: str):
+        pass
+
+    @abstractmethod
+    def load_loans(self):
+        pass
+
+    @abstractmethod
+    def save_loan(self, loan: Loan):
+        pass
+
+    @abstractmethod
+    def delete_loan(self, barcode: str):
+        pass
+
+    @abstractmethod
+    def load_holds(self):
+        pass
+
+    @abstractmethod
+    def save_hold(self, isbn: str, user_id: str, placed_at: datetime):
+        pass
+
+    @abstractmethod
+    def delete_hold(self, isbn: str, user_id: str):
+        pass
+
+    @abstractmethod
+    def get_meta(self, key: str):
+        pass
+
+    @abstractmethod
+    def set_meta(self, key: str, value: str):
+        pass
+
+    @abstractmethod
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+# SQLiteStorage Class
+class SQLiteStorage(LibraryStorage):
+    def __init__(self, db_file: str):
+        self._conn = sqlite3.connect(db_file)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS books ("
+            "isbn TEXT PRIMARY KEY, title TEXT NOT NULL, author TEXT NOT NULL, is_borrowed INTEGER NOT NULL, copies TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "user_id TEXT PRIMARY KEY, name TEXT NOT NULL, borrowed_books_isbns TEXT NOT NULL)"
+        )
+        self._migrate()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS loans ("
+            "barcode TEXT PRIMARY KEY, isbn TEXT NOT NULL, user_id TEXT NOT NULL, borrowed_at TEXT NOT NULL, "
+            "due_at TEXT NOT NULL, renewals INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS holds ("
+            "isbn TEXT NOT NULL, user_id TEXT NOT NULL, placed_at TEXT NOT NULL, PRIMARY KEY (isbn, user_id))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def _columns(self, table: str):
+        return {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+
+    def _migrate(self):
+        # Databases from before multi-copy holdings: single-copy books and loans keyed by ISBN
+        if 'copies' not in self._columns('books'):
+            self._conn.execute("ALTER TABLE books ADD COLUMN copies TEXT")
+        loan_columns = self._columns('loans')
+        if loan_columns and 'barcode' not in loan_columns:
+            self._conn.execute("ALTER TABLE loans RENAME TO loans_by_isbn")
+            self._conn.execute(
+                "CREATE TABLE loans ("
+                "barcode TEXT PRIMARY KEY, isbn TEXT NOT NULL, user_id TEXT NOT NULL, borrowed_at TEXT NOT NULL, "
+                "due_at TEXT NOT NULL, renewals INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT INTO loans SELECT isbn || '-1', isbn, user_id, borrowed_at, due_at, renewals FROM loans_by_isbn"
+            )
+            self._conn.execute("DROP TABLE loans_by_isbn")
+
+    def load_books(self):
+        for isbn, title, author, is_borrowed, copies in self._conn.execute(
+                "SELECT isbn, title, author, is_borrowed, copies FROM books"):
+            yield {'isbn': isbn, 'title': title, 'author': author, 'is_borrowed': bool(is_borrowed),
+                   'copies': json.loads(copies) if copies else None}
+
+    def load_users(self):
+        for user_id, name, borrowed in self._conn.execute("SELECT user_id, name, borrowed_books_isbns FROM users"):
+            yield {'user_id': user_id, 'name': name, 'borrowed_books_isbns': json.loads(borrowed)}
+
+    def save_book(self, book: Book):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO books (isbn, title, author, is_borrowed, copies) VALUES (?, ?, ?, ?, ?)",
+            (book.isbn, book.title, book.author, int(book.is_borrowed), json.dumps(book.copies))
+        )
+
+    def delete_book(self, isbn: str):
+        self._conn.execute("DELETE FROM books WHERE isbn = ?", (isbn,))
+
+    def save_user(self, user: User):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO users (user_id, name, borrowed_books_isbns) VALUES (?, ?, ?)",
+            (user.user_id, user.name, json.dumps(user.borrowed_books_isbns))
+        )
+
+    def delete_user(self, user_id: str):
+        self._conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+    def load_loans(self):
+        for barcode, isbn, user_id, borrowed_at, due_at, renewals in self._conn.execute(
+                "SELECT barcode, isbn, user_id, borrowed_at, due_at, renewals FROM loans"):
+            yield {'barcode': barcode, 'isbn': isbn, 'user_id': user_id, 'borrowed_at': borrowed_at,
+                   'due_at': due_at, 'renewals': renewals}
+
+    def save_loan(self, loan: Loan):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO loans (barcode, isbn, user_id, borrowed_at, due_at, renewals) VALUES (?, ?, ?, ?, ?, ?)",
+            (loan.barcode, loan.isbn, loan.user_id, loan.borrowed_at.isoformat(), loan.due_at.isoformat(), loan.renewals)
+        )
+
+    def delete_loan(self, barcode: str):
+        self._conn.execute("DELETE FROM loans WHERE barcode = ?", (barcode,))
+
+    def load_holds(self):
+        for isbn, user_id, placed_at in self._conn.execute(
+                "SELECT isbn, user_id, placed_at FROM holds ORDER BY placed_at, rowid"):
+            yield {'isbn': isbn, 'user_id': user_id, 'placed_at': placed_at}
+
+    def save_hold(self, isbn: str, user_id: str, placed_at: datetime):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO holds (isbn, user_id, placed_at) VALUES (?, ?, ?)",
+            (isbn, user_id, placed_at.isoformat())
+        )
+
+    def delete_hold(self, isbn: str, user_id: str):
+        self._conn.execute("DELETE FROM holds WHERE isbn = ? AND user_id = ?", (isbn, user_id))
+
+    def get_meta(self, key: str):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
 # Library Class
 class Library:
-    def __init__(self, book_file='books.json', user_file='users.json'):
+    LOAN_PERIOD = timedelta(days=14)
+    MAX_RENEWALS = 2
+    BOOK_SORT_ORDERS = ('isbn', 'title', 'author')
+
+    def __init__(self, book_file='books.json', user_file='users.json', storage=None, on_progress=None):
         self._books = {}  # isbn: Book
         self._users = {}  # user_id: User
+        self._index = BookIndex()
+        self._loans = {}  # barcode: Loan
+        self._borrowers = {}  # isbn: {user_id: barcode}
+        self._due_index = []  # sorted (due_at, barcode) pairs for overdue and due-soon range queries
+        self._holds = {}  # isbn: deque of user_ids waiting, oldest first
+        self._available = {}  # insertion-ordered set of ISBNs with at least one copy on the shelf
+        # Sorted key lists backing cursor pagination; every key ends with the ISBN / user ID so it is unique
+        self._book_orders = {sort_by: [] for sort_by in self.BOOK_SORT_ORDERS}
+        self._available_orders = {sort_by: [] for sort_by in self.BOOK_SORT_ORDERS}  # the same, available books only
+        self._user_order = []
         self._data_file_books = book_file
         self._data_file_users = user_file
+        # Only changed records are written to storage; the JSON files are an import/export format.
+        # The default database sits next to the book file rather than in whatever directory the process started in
+        if storage is None:
+            storage = SQLiteStorage(os.path.join(os.path.dirname(os.path.abspath(book_file)), 'library.db'))
+        self._storage = storage
+        self._on_progress = on_progress
         self._load_data()
 
+    def _add_loaded_book(self, b):
+        book = Book(b['title'], b['author'], b['isbn'], copies=0)
+        if b.get('copies'):
+            book._copies = dict(b['copies'])
+            book._available = sum(1 for borrowed in book._copies.values() if not borrowed)
+        else:
+            book.add_copy()
+            book.is_borrowed = b['is_borrowed']
+        # Re-importing a known ISBN replaces the book, so its old index entries go first. The sort orders are
+        # rebuilt once the whole load is in
+        previous = self._books.get(book.isbn)
+        if previous is not None:
+            self._index.remove(previous)
+        self._books[book.isbn] = book
+        self._index.add(book)
+        if book.available_copies:
+            self._available[book.isbn] = None
+        else:
+            self._available.pop(book.isbn, None)
+        return book
+
+    def _add_loaded_user(self, u):
+        user = User(u['name'], u['user_id'])
+        user._borrowed_books_isbns = dict.fromkeys(u['borrowed_books_isbns'])
+        self._users[user.user_id] = user
+        return user
+
+    def _rebuild_orders(self):
+        # One sort per list after a bulk load; single-record changes keep them sorted with insort
+        self._book_orders = {sort_by: sorted(self._sort_key(book, sort_by) for book in self._books.values())
+                             for sort_by in self.BOOK_SORT_ORDERS}
+        self._available_orders = {sort_by: sorted(self._sort_key(self._books[isbn], sort_by) for isbn in self._available)
+                                  for sort_by in self.BOOK_SORT_ORDERS}
+        self._user_order = sorted(self._users)
+        self._due_index = sorted((loan.due_at, loan.barcode) for loan in self._loans.values())
+
     def _load_data(self):
-        # Load books
+        for b in self._storage.load_books():
+            self._add_loaded_book(b)
+        for u in self._storage.load_users():
+            self._add_loaded_user(u)
+        for l in self._storage.load_loans():
+            loan = Loan(l['barcode'], l['isbn'], l['user_id'], datetime.fromisoformat(l['borrowed_at']),
+                        datetime.fromisoformat(l['due_at']), l['renewals'])
+            self._track_loan(loan)
+        for h in self._storage.load_holds():
+            self._holds.setdefault(h['isbn'], deque()).append(h['user_id'])
+        # The JSON files are migrated once; a store emptied later is not refilled from them. Stores that already
+        # hold data from before the migration was recorded count as migrated
+        if self._storage.get_meta('json_imported') is None:
+            self._storage.set_meta('json_imported', datetime.now().isoformat())
+            if not self._books and not self._users:
+                self._import_records(self._data_file_books, self._data_file_users)
+            self._storage.commit()
+        self._backfill_loans()
+        self._rebuild_orders()
+
+    def _backfill_loans(self):
+        # Borrowings recorded before loans were tracked get a loan starting now
+        now = datetime.now()
+        for user in self._users.values():
+            for isbn in user.borrowed_books_isbns:
+                book = self._books.get(isbn)
+                if not book or user.user_id in self._borrowers.get(isbn, {}):
+                    continue
+                barcode = next((b for b, borrowed in book.copies.items() if borrowed and b not in self._loans), None)
+                if barcode is None:
+                    continue
+                loan = Loan(barcode, isbn, user.user_id, now, now + self.LOAN_PERIOD)
+                self._track_loan(loan)
+                self._storage.save_loan(loan)
+        self._storage.commit()
+
+    def _refresh_availability(self, book: Book):
+        if bool(book.available_copies) == (book.isbn in self._available):
+            return
+        if book.available_copies:
+            self._available[book.isbn] = None
+            self._add_to_orders(book, self._available_orders)
+        else:
+            del self._available[book.isbn]
+            self._remove_from_orders(book, self._available_orders)
+
+    def _sort_key(self, book: Book, sort_by: str):
+        if sort_by == 'title':
+            return (book.title.casefold(), book.isbn)
+        if sort_by == 'author':
+            return (book.author.casefold(), book.isbn)
+        return (book.isbn,)
+
+    def _add_to_orders(self, book: Book, orders):
+        for sort_by, order in orders.items():
+            insort(order, self._sort_key(book, sort_by))
+
+    def _remove_from_orders(self, book: Book, orders):
+        for sort_by, order in orders.items():
+            del order[bisect_left(order, self._sort_key(book, sort_by))]
+
+    def _track_loan(self, loan: Loan):
+        self._loans[loan.barcode] = loan
+        self._borrowers.setdefault(loan.isbn, {})[loan.user_id] = loan.barcode
+
+    def _add_loan(self, loan: Loan):
+        self._track_loan(loan)
+        insort(self._due_index, (loan.due_at, loan.barcode))
+
+    def _remove_loan(self, barcode: str):
+        loan = self._loans.pop(barcode, None)
+        if loan is not None:
+            position = bisect_left(self._due_index, (loan.due_at, barcode))
+            del self._due_index[position]
+            borrowers = self._borrowers.get(loan.isbn, {})
+            borrowers.pop(loan.user_id, None)
+            if not borrowers:
+                self._borrowers.pop(loan.isbn, None)
+        return loan
+
+    def import_json(self, book_file: str, user_file: str, on_progress=None):
+        self._import_records(book_file, user_file, on_progress)
+        self._rebuild_orders()
+
+    def _import_records(self, book_file: str, user_file: str, on_progress=None):
+        on_progress = on_progress or self._on_progress
         try:
-            with open(self._data_file_books, 'r') as f:
-                books_data = json.load(f)
-            for b in books_data:
-                book = Book(b['title'], b['author'], b['isbn'])
-                book.is_borrowed = b['is_borrowed']
-                self._books[book.isbn] = book
+            for b in iter_json_records(book_file, on_progress):
+                self._storage.save_book(self._add_loaded_book(b))
         except FileNotFoundError:
             pass
-
-        # Load users
         try:
-            with open(self._data_file_users, 'r') as f:
-                users_data = json.load(f)
-            for u in users_data:
-                user = User(u['name'], u['user_id'])
-                user._borrowed_books_isbns = u['borrowed_books_isbns']
-                self._users[user.user_id] = user
+            for u in iter_json_records(user_file, on_progress):
+                self._storage.save_user(self._add_loaded_user(u))
         except FileNotFoundError:
             pass
+        self._storage.commit()
+
+    @staticmethod
+    def _write_json(path, records):
+        with open(path, 'w') as f:
+            if path.lower().endswith('.jsonl'):
+                for record in records:
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            else:
+                json.dump(list(records), f, indent=4)
+
+    def export_json(self, book_file: str, user_file: str):
+        self._write_json(book_file, (b.to_dict() for b in self._books.values()))
+        self._write_json(user_file, (u.to_dict() for u in self._users.values()))
 
-    def _save_data(self):
-        # Save books
-        with open(self._data_file_books, 'w') as f:
-            json.dump([b.to_dict() for b in self._books.values()], f, indent=4)
-        # Save users
-        with open(self._data_file_users, 'w') as f:
-            json.dump([u.to_dict() for u in self._users.values()], f, indent=4)
+    def close(self):
+        self._storage.close()
 
     def add_book(self, book: Book):
         if book.isbn in self._books:
             print(f"Book with ISBN {book.isbn} already exists.")
             return False
         self._books[book.isbn] = book
-        self._save_data()
+        self._index.add(book)
+        self._add_to_orders(book, self._book_orders)
+        self._refresh_availability(book)
+        self._storage.save_book(book)
+        self._storage.commit()
+        return True
+
+    def add_copies(self, isbn: str, count: int):
+        book = self._books.get(isbn)
+        if not book:
+            print("Book not found.")
+            return False
+        if count <= 0:
+            print("Number of copies must be positive.")
+            return False
+        for _ in range(count):
+            book.add_copy()
+        self._assign_from_holds(book, datetime.now())
+        self._refresh_availability(book)
+        self._storage.save_book(book)
+        self._storage.commit()
         return True
 
     def remove_book(self, isbn: str):
@@ -146,11 +865,19 @@ class Library:
         if not book:
             print("Book not found.")
             return False
-        if book.is_borrowed:
+        if isbn in self._borrowers:
             print("Cannot remove a borrowed book.")
             return False
         del self._books[isbn]
-        self._save_data()
+        self._index.remove(book)
+        self._remove_from_orders(book, self._book_orders)
+        if isbn in self._available:
+            del self._available[isbn]
+            self._remove_from_orders(book, self._available_orders)
+        for user_id in self._holds.pop(isbn, ()):
+            self._storage.delete_hold(isbn, user_id)
+        self._storage.delete_book(isbn)
+        self._storage.commit()
         return True
 
     def register_user(self, user: User):
@@ -158,7 +885,9 @@ class Library:
             print(f"User ID {user.user_id} already exists.")
             return False
         self._users[user.user_id] = user
-        self._save_data()
+        insort(self._user_order, user.user_id)
+        self._storage.save_user(user)
+        self._storage.commit()
         return True
 
     def remove_user(self, user_id: str):
@@ -166,32 +895,100 @@ class Library:
         if not user:
             print("User not found.")
             return False
-        if user.borrowed_books_isbns:
+        if user.borrowed_count:
             print("User has borrowed books. Cannot remove.")
             return False
         del self._users[user_id]
-        self._save_data()
+        del self._user_order[bisect_left(self._user_order, user_id)]
+        for isbn, queue in self._holds.items():
+            if user_id in queue:
+                queue.remove(user_id)
+                self._storage.delete_hold(isbn, user_id)
+        self._storage.delete_user(user_id)
+        self._storage.commit()
         return True
 
+    def _check_borrow(self, book, user):
+        if not book:
+            return "Book not found."
+        if not user:
+            return "User not found."
+        if user.has_borrowed(book.isbn):
+            return "User already has a copy of this book."
+        if not book.available_copies:
+            return "No copies available."
+        return None
+
+    def _apply_borrow(self, book, user, now):
+        barcode = book.borrow()
+        user.add_borrowed_book_isbn(book.isbn)
+        loan = Loan(barcode, book.isbn, user.user_id, now, now + self.LOAN_PERIOD)
+        self._add_loan(loan)
+        self._refresh_availability(book)
+        self._storage.save_book(book)
+        self._storage.save_loan(loan)
+        return loan
+
+    def _check_return(self, book, user):
+        if not book:
+            return "Book not found."
+        if not user:
+            return "User not found."
+        if user.user_id not in self._borrowers.get(book.isbn, {}) or not user.has_borrowed(book.isbn):
+            return "This user didn't borrow this book."
+        return None
+
+    def _apply_return(self, book, user):
+        barcode = self._borrowers[book.isbn][user.user_id]
+        book.return_book(barcode)
+        user.remove_borrowed_book_isbn(book.isbn)
+        self._remove_loan(barcode)
+        self._storage.delete_loan(barcode)
+        self._assign_from_holds(book, datetime.now())
+        self._refresh_availability(book)
+        self._storage.save_book(book)
+
+    def _assign_from_holds(self, book, now):
+        # Copies coming back onto the shelf go to the oldest holds first
+        queue = self._holds.get(book.isbn)
+        while queue and book.available_copies:
+            user = self._users.get(queue.popleft())
+            if user is None:
+                continue
+            self._storage.delete_hold(book.isbn, user.user_id)
+            if user.has_borrowed(book.isbn):
+                continue
+            loan = self._apply_borrow(book, user, now)
+            self._storage.save_user(user)
+            print(f"Copy {loan.barcode} of '{book.title}' assigned to {user.name} (ID: {user.user_id}) from the hold queue.")
+        if not queue:
+            self._holds.pop(book.isbn, None)
+
     def borrow_book(self, isbn: str, user_id: str):
         book = self._books.get(isbn)
         user = self._users.get(user_id)
-        if not book:
-            print("Book not found.")
-            return False
-        if not user:
-            print("User not found.")
+        error = self._check_borrow(book, user)
+        if error:
+            print(error)
             return False
-        if book.is_borrowed:
-            print("Book is already borrowed.")
-            return False
-        if book.borrow():
-            user.add_borrowed_book_isbn(isbn)
-            self._save_data()
-            return True
-        return False
+        self._apply_borrow(book, user, datetime.now())
+        self._storage.save_user(user)
+        self._storage.commit()
+        return True
 
     def return_book(self, isbn: str, user_id: str):
+        book = self._books.get(isbn)
+        user = self._users.get(user_id)
+        error = self._check_return(book, user)
+        if error:
+            print(error)
+            return False
+        self._apply_return(book, user)
+        self._storage.save_user(user)
+        self._storage.commit()
+        return True
+
+    def place_hold(self, isbn: str, user_id: str):
         book = self._books.get(isbn)
         user = self._users.get(user_id)
         if not book:
@@ -200,33 +997,154 @@ class Library:
         if not user:
             print("User not found.")
             return False
-        if isbn not in user.borrowed_books_isbns:
-            print("This user didn't borrow this book.")
+        if user.has_borrowed(isbn):
+            print("User already has a copy of this book.")
             return False
-        if book.return_book():
-            user.remove_borrowed_book_isbn(isbn)
-            self._save_data()
-            return True
-        return False
+        if book.available_copies:
+            print("A copy is available. Borrow it instead.")
+            return False
+        queue = self._holds.setdefault(isbn, deque())
+        if user_id in queue:
+            print("User is already waiting for this book.")
+            return False
+        queue.append(user_id)
+        self._storage.save_hold(isbn, user_id, datetime.now())
+        self._storage.commit()
+        return True
+
+    def cancel_hold(self, isbn: str, user_id: str):
+        queue = self._holds.get(isbn)
+        if not queue or user_id not in queue:
+            print("No hold found for this user and book.")
+            return False
+        queue.remove(user_id)
+        if not queue:
+            del self._holds[isbn]
+        self._storage.delete_hold(isbn, user_id)
+        self._storage.commit()
+        return True
+
+    def hold_position(self, isbn: str, user_id: str):
+        queue = self._holds.get(isbn, ())
+        return list(queue).index(user_id) + 1 if user_id in queue else None
 
-    def search_book(self, query: str):
+    def _run_batch(self, user_id, isbns, check, apply):
+        # All-or-nothing: every ISBN is validated before any is applied, then one commit covers the batch
+        user = self._users.get(user_id)
         results = []
-        query_lower = query.lower()
-        for book in self._books.values():
-            if (query_lower in book.title.lower() or
-                query_lower in book.author.lower() or
-                query_lower in book.isbn):
-                results.append(book)
-        return results
+        seen = set()
+        for isbn in isbns:
+            error = check(self._books.get(isbn), user)
+            if not error and isbn in seen:
+                error = "Duplicate ISBN in batch."
+            seen.add(isbn)
+            results.append((isbn, error or "OK"))
+        if not isbns or any(message != "OK" for _, message in results):
+            return False, [(isbn, "Skipped." if message == "OK" else message) for isbn, message in results]
+        for isbn in isbns:
+            apply(self._books[isbn], user)
+        self._storage.save_user(user)
+        self._storage.commit()
+        return True, results
 
-    def display_all_books(self, show_available_only=False):
-        for book in self._books.values():
-            if show_available_only and book.is_borrowed:
+    def borrow_books(self, user_id: str, isbns):
+        now = datetime.now()
+        return self._run_batch(user_id, list(isbns), self._check_borrow,
+                               lambda book, user: self._apply_borrow(book, user, now))
+
+    def return_books(self, user_id: str, isbns):
+        return self._run_batch(user_id, list(isbns), self._check_return, self._apply_return)
+
+    def renew_book(self, isbn: str, user_id: str):
+        loan = self.get_loan(isbn, user_id)
+        if not loan:
+            print("This user didn't borrow this book.")
+            return False
+        if loan.renewals >= self.MAX_RENEWALS:
+            print("Renewal limit reached.")
+            return False
+        if self._holds.get(isbn):
+            print("Other users are waiting for this book. Cannot renew.")
+            return False
+        self._remove_loan(loan.barcode)
+        loan.renew(self.LOAN_PERIOD)
+        self._add_loan(loan)
+        self._storage.save_loan(loan)
+        self._storage.commit()
+        return True
+
+    def get_loan(self, isbn: str, user_id: str):
+        barcode = self._borrowers.get(isbn, {}).get(user_id)
+        return self._loans.get(barcode) if barcode else None
+
+    def get_borrowers(self, isbn: str):
+        return [self._users[user_id] for user_id in self._borrowers.get(isbn, {}) if user_id in self._users]
+
+    def overdue_loans(self, now=None):
+        now = now or datetime.now()
+        for due_at, barcode in self._due_index:
+            if due_at >= now:
+                break
+            yield self._loans[barcode]
+
+    def loans_due_soon(self, within=timedelta(days=3), now=None):
+        now = now or datetime.now()
+        start = bisect_left(self._due_index, (now,))
+        end = bisect_right(self._due_index, (now + within, chr(0x10FFFF)))
+        for position in range(start, end):
+            yield self._loans[self._due_index[position][1]]
+
+    def generate_overdue_notices(self, now=None):
+        now = now or datetime.now()
+        for loan in self.overdue_loans(now):
+            user = self._users.get(loan.user_id)
+            book = self._books.get(loan.isbn)
+            if not user or not book:
+                continue
+            days = (now - loan.due_at).days
+            yield (f"Dear {user.name} (ID: {user.user_id}), '{book.title}' (ISBN: {book.isbn}, copy {loan.barcode}) "
+                   f"was due on {loan.due_at:%Y-%m-%d} and is {days} day(s) overdue.")
+
+    def search_book(self, query: str, limit=None):
+        isbns = self._index.search(query, limit)
+        return [self._books[isbn] for isbn in isbns]
+
+    def iter_books(self, sort_by='isbn', after=None, available_only=False, author=None):
+        # Resumes strictly after the cursor, so pages stay stable while books are added or removed
+        if sort_by not in self._book_orders:
+            raise ValueError(f"Unknown sort order: {sort_by}")
+        order = (self._available_orders if available_only else self._book_orders)[sort_by]
+        if isinstance(after, str):
+            after = (after,)
+        start = bisect_right(order, after) if after else 0
+        author = author.casefold() if author else None
+        for key in islice(order, start, None):
+            book = self._books[key[-1]]
+            if author and book.author.casefold() != author:
                 continue
+            yield key, book
+
+    def list_books(self, limit=20, sort_by='isbn', after=None, available_only=False, author=None):
+        page = list(islice(self.iter_books(sort_by, after, available_only, author), limit + 1))
+        next_cursor = page[limit - 1][0] if len(page) > limit else None
+        return [book for _, book in page[:limit]], next_cursor
+
+    def iter_users(self, after=None):
+        start = bisect_right(self._user_order, after) if after else 0
+        for user_id in islice(self._user_order, start, None):
+            yield self._users[user_id]
+
+    def list_users(self, limit=20, after=None):
+        page = list(islice(self.iter_users(after), limit + 1))
+        next_cursor = page[limit - 1].user_id if len(page) > limit else None
+        return page[:limit], next_cursor
+
+    def display_all_books(self, show_available_only=False):
+        for _, book in self.iter_books(available_only=show_available_only):
             print(book)
 
     def display_all_users(self):
-        for user in self._users.values():
+        for user in self.iter_users():
             print(user)
 
     def display_user_borrowed_books(self, user_id: str):
@@ -234,16 +1152,32 @@ class Library:
         if not user:
             print("User not found.")
             return
-        if not user.borrowed_books_isbns:
+        if not user.borrowed_count:
             print("This user has not borrowed any books.")
             return
         print(f"Books borrowed by {user.name} (ID: {user.user_id}):")
         for isbn in user.borrowed_books_isbns:
             book = self._books.get(isbn)
             if book:
-                print(book)
+                loan = self.get_loan(isbn, user_id)
+                print(f"{book}, Copy: {loan.barcode}, Due: {loan.due_at:%Y-%m-%d}" if loan else book)
 
 # Console Interface
+PAGE_SIZE = 20
+
+def print_pages(fetch_page):
+    cursor = None
+    while True:
+        items, cursor = fetch_page(cursor)
+        if not items and cursor is None:
+            print("Nothing to show.")
+        for item in items:
+            print(item)
+        if cursor is None:
+            return
+        if input("Press Enter for the next page, or Q to stop: ").strip().lower() == 'q':
+            return
+
 def main():
     library = Library()
 
@@ -259,14 +1193,28 @@ def main():
         print("8. Display All Books")
         print("9. Display All Users")
         print("10. Show User Borrowed Books")
+        print("11. Export to JSON")
+        print("12. Renew Book")
+        print("13. Show Overdue Notices")
+        print("14. Borrow Multiple Books")
+        print("15. Return Multiple Books")
+        print("16. Find Borrowers of Book")
+        print("17. Add Copies")
+        print("18. Place Hold")
+        print("19. Cancel Hold")
         print("X. Exit")
-        choice = input("Enter choice (1-10): ")
+        choice = input("Enter choice (1-19): ")
 
         if choice == '1':
             title = input("Enter book title: ")
             author = input("Enter author: ")
             isbn = input("Enter ISBN: ")
-            book = Book(title, author, isbn)
+            try:
+                copies = int(input("Enter number of copies: ") or 1)
+            except ValueError:
+                print("Invalid number of copies.")
+                continue
+            book = Book(title, author, isbn, copies)
             if library.add_book(book):
                 print("Book added successfully.")
         elif choice == '2':
@@ -295,24 +1243,84 @@ def main():
                 print("Book returned successfully.")
         elif choice == '7':
             query = input("Enter title, author, or ISBN to search: ")
-            results = library.search_book(query)
+            results = library.search_book(query, limit=PAGE_SIZE)
             if results:
                 print("Search Results:")
                 for b in results:
                     print(b)
+                if len(results) == PAGE_SIZE:
+                    print(f"Showing the best {PAGE_SIZE} matches; refine the search to see others.")
             else:
                 print("No matching books found.")
         elif choice == '8':
+            sort_by = input("Sort by (isbn/title/author) [isbn]: ").strip().lower() or 'isbn'
+            if sort_by not in Library.BOOK_SORT_ORDERS:
+                print("Invalid sort order.")
+                continue
+            available_only = input("Available books only? (y/n): ").strip().lower() == 'y'
             print("All Books:")
-            library.display_all_books()
+            print_pages(lambda after: library.list_books(PAGE_SIZE, sort_by, after, available_only))
         elif choice == '9':
             print("All Users:")
-            library.display_all_users()
+            print_pages(lambda after: library.list_users(PAGE_SIZE, after))
         elif choice == '10':
             user_id = input("Enter user ID: ")
             library.display_user_borrowed_books(user_id)
+        elif choice == '11':
+            library.export_json('books.json', 'users.json')
+            print("Exported to books.json and users.json.")
+        elif choice == '12':
+            isbn = input("Enter ISBN of the book to renew: ")
+            user_id = input("Enter user ID: ")
+            if library.renew_book(isbn, user_id):
+                print(f"Book renewed. New due date: {library.get_loan(isbn, user_id).due_at:%Y-%m-%d}")
+        elif choice == '13':
+            found = False
+            for notice in library.generate_overdue_notices():
+                print(notice)
+                found = True
+            if not found:
+                print("No overdue books.")
+        elif choice in ('14', '15'):
+            user_id = input("Enter user ID: ")
+            isbns = [isbn.strip() for isbn in input("Enter ISBNs separated by commas: ").split(',') if isbn.strip()]
+            if choice == '14':
+                success, results = library.borrow_books(user_id, isbns)
+            else:
+                success, results = library.return_books(user_id, isbns)
+            for isbn, message in results:
+                print(f"{isbn}: {message}")
+            print("Batch completed." if success else "Batch rejected. No books were changed.")
+        elif choice == '16':
+            isbn = input("Enter ISBN: ")
+            borrowers = library.get_borrowers(isbn)
+            if borrowers:
+                for borrower in borrowers:
+                    print(f"Borrowed by: {borrower}")
+            else:
+                print("This book is not currently borrowed.")
+        elif choice == '17':
+            isbn = input("Enter ISBN: ")
+            try:
+                count = int(input("Enter number of copies to add: "))
+            except ValueError:
+                print("Invalid number of copies.")
+                continue
+            if library.add_copies(isbn, count):
+                print("Copies added.")
+        elif choice == '18':
+            isbn = input("Enter ISBN of the book to reserve: ")
+            user_id = input("Enter user ID: ")
+            if library.place_hold(isbn, user_id):
+                print(f"Hold placed. Position in queue: {library.hold_position(isbn, user_id)}")
+        elif choice == '19':
+            isbn = input("Enter ISBN: ")
+            user_id = input("Enter user ID: ")
+            if library.cancel_hold(isbn, user_id):
+                print("Hold cancelled.")
         elif choice == 'X' or choice == 'x':
             print("Exiting...")
+            library.close()
             break
         else:
             print("Invalid choice. Please try again.")
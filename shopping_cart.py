@@ -1,6 +1,92 @@
+import heapq
 import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+from uuid import uuid4
 
+class JSONStream:
+    def __init__(self, f, chunk_size=1 << 16):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._consumed = 0
+        self._eof = False
+
+    @property
+    def offset(self):
+        return self._consumed + self._position
+
+    def _fill(self):
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._consumed += self._position
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def peek(self):
+        # Next non-whitespace character, or '' at the end of the input
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in ' \t\r\n':
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.offset}")
+        self._position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except ValueError:
+                if self._eof or not self._fill():
+                    raise
+                continue
+            # A number or literal that ends the buffer may continue in the next chunk
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._position = end
+            return value
+
+def iter_json_records(path, on_progress=None, progress_every=10000):
+    # Accepts a JSON array or JSON Lines; on_progress(path, records, offset) reports how far the load has got
+    with open(path, 'r') as f:
+        stream = JSONStream(f)
+        count = 0
+        is_array = stream.peek() == '['
+        if is_array:
+            stream.expect('[')
+        while stream.peek() not in ('', ']'):
+            yield stream.value()
+            count += 1
+            if is_array and stream.peek() == ',':
+                stream.expect(',')
+            if on_progress and count % progress_every == 0:
+                on_progress(path, count, stream.offset)
+        if is_array:
+            stream.expect(']')
+        if on_progress:
+            on_progress(path, count, stream.offset)
 class Product:
+    __slots__ = ('_product_id', '_name', '_price', '_quantity_available')
+
     def __init__(self, product_id: str, name: str, price: float, quantity_available: int):
         self._product_id = product_id
         self._name = name
@@ -58,6 +144,8 @@ class Product:
     def __str__(self):
         return self.display_details()
 class PhysicalProduct(Product):
+    __slots__ = ('_weight',)
+
     def __init__(self, product_id: str, name: str, price: float, quantity_available: int, weight: float):
         super().__init__(product_id, name, price, quantity_available)
         self._weight = weight
@@ -78,6 +166,8 @@ class PhysicalProduct(Product):
         })
         return data
 class DigitalProduct(Product):
+    __slots__ = ('_download_link',)
+
     def __init__(self, product_id: str, name: str, price: float, quantity_available: int, download_link: str):
         super().__init__(product_id, name, price, quantity_available)
         self._download_link = download_link
@@ -98,6 +188,8 @@ class DigitalProduct(Product):
         })
         return data
 class CartItem:
+    __slots__ = ('_product', '_quantity')
+
     def __init__(self, product: Product, quantity: int):
         self._product = product
         self._quantity = quantity
@@ -129,135 +221,1207 @@ class CartItem:
             'product_id': self._product.product_id,
             'quantity': self._quantity
         }
-class ShoppingCart:
-    def __init__(self, product_catalog_file='products.json', cart_state_file='cart.json'):
-        self._items = {}  # key: product_id, value: CartItem
+def to_cents(amount) -> int:
+    return round(amount * 100)
+class PricingEngine:
+    # Rules are given in dollars and percentages; lines are priced in integer cents so running totals never drift
+    PRODUCT_TYPE_NAMES = {Product: 'product', PhysicalProduct: 'physical', DigitalProduct: 'digital'}
+
+    def __init__(self, tax_rate=0.0, shipping_base=0.0, shipping_per_kg=0.0, free_shipping_over=None):
+        self._tax_rate = tax_rate
+        self._tax_rates = {}  # product type: rate overriding tax_rate
+        self._shipping_base = to_cents(shipping_base)
+        self._shipping_per_kg = to_cents(shipping_per_kg)
+        self._free_shipping_over = None if free_shipping_over is None else to_cents(free_shipping_over)
+        self._promotions = {}  # product_id or product type: percent off
+        self._tiers = {}  # product_id, or None for every product: sorted (min_quantity, percent off)
+        # Bumped on every rule change; carts reprice their lines only when it moves
+        self._version = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def set_tax_rate(self, rate: float, product_type=None) -> None:
+        if product_type is None:
+            self._tax_rate = rate
+        else:
+            self._tax_rates[product_type] = rate
+        self._version += 1
+
+    def set_shipping(self, base: float, per_kg: float, free_over=None) -> None:
+        self._shipping_base = to_cents(base)
+        self._shipping_per_kg = to_cents(per_kg)
+        self._free_shipping_over = None if free_over is None else to_cents(free_over)
+        self._version += 1
+
+    def add_promotion(self, target: str, percent_off: float) -> None:
+        # target is a product_id or a product type ('product', 'physical', 'digital')
+        self._promotions[target] = percent_off
+        self._version += 1
+
+    def remove_promotion(self, target: str) -> None:
+        if self._promotions.pop(target, None) is not None:
+            self._version += 1
+
+    def add_bulk_tier(self, min_quantity: int, percent_off: float, product_id=None) -> None:
+        insort(self._tiers.setdefault(product_id, []), (min_quantity, percent_off))
+        self._version += 1
+
+    def clear_bulk_tiers(self, product_id=None) -> None:
+        if self._tiers.pop(product_id, None) is not None:
+            self._version += 1
+
+    def _tier_percent(self, key, quantity: int) -> float:
+        tiers = self._tiers.get(key)
+        if not tiers:
+            return 0.0
+        position = bisect_right(tiers, (quantity, float('inf')))
+        return max((percent for _, percent in tiers[:position]), default=0.0)
+
+    def price_line(self, product: Product, quantity: int) -> tuple:
+        # (subtotal, discount, tax, grams) for one cart line; the best single discount applies, they do not stack
+        product_type = self.PRODUCT_TYPE_NAMES.get(type(product), 'product')
+        subtotal = to_cents(product.price) * quantity
+        percent = max(self._promotions.get(product.product_id, 0.0), self._promotions.get(product_type, 0.0),
+                      self._tier_percent(product.product_id, quantity), self._tier_percent(None, quantity))
+        discount = round(subtotal * percent / 100)
+        tax = round((subtotal - discount) * self._tax_rates.get(product_type, self._tax_rate))
+        grams = round(product.weight * 1000) * quantity if isinstance(product, PhysicalProduct) else 0
+        return subtotal, discount, tax, grams
+
+    def shipping(self, merchandise: int, grams: int) -> int:
+        if grams <= 0:
+            return 0
+        if self._free_shipping_over is not None and merchandise >= self._free_shipping_over:
+            return 0
+        return self._shipping_base + round(self._shipping_per_kg * grams / 1000)
+class CatalogIndex:
+    WEIGHT_BUCKETS = ((1.0, 'under 1 kg'), (5.0, '1-5 kg'), (20.0, '5-20 kg'), (float('inf'), '20 kg and over'))
+
+    def __init__(self, catalog: dict):
+        self._catalog = catalog  # product_id: Product, shared with the inventory
+        self._tokens = {}  # name token: product_ids
+        self._types = {}  # product type: product_ids
+        self._weights = {}  # weight bucket label: product_ids
+        self._in_stock = set()  # product_ids with stock left to reserve
+        self._prices = []  # sorted (price, product_id)
+        for product in catalog.values():
+            self._add_postings(product)
+        self._prices = sorted((product.price, product.product_id) for product in catalog.values())
+
+    @staticmethod
+    def tokenize(text: str) -> list:
+        return re.findall(r'\w+', text.casefold())
+
+    @classmethod
+    def weight_bucket(cls, weight: float) -> str:
+        for limit, label in cls.WEIGHT_BUCKETS:
+            if weight < limit:
+                return label
+        return cls.WEIGHT_BUCKETS[-1][1]
+
+    def _add_postings(self, product: Product) -> None:
+        product_id = product.product_id
+        for token in set(self.tokenize(product.name)):
+            self._tokens.setdefault(token, set()).add(product_id)
+        self._types.setdefault(PricingEngine.PRODUCT_TYPE_NAMES.get(type(product), 'product'), set()).add(product_id)
+        if isinstance(product, PhysicalProduct):
+            self._weights.setdefault(self.weight_bucket(product.weight), set()).add(product_id)
+        self.update_stock(product)
+
+    def add(self, product: Product) -> None:
+        self._add_postings(product)
+        insort(self._prices, (product.price, product.product_id))
+
+    @property
+    def prices(self):
+        return self._prices
+
+    def update_stock(self, product: Product) -> None:
+        if product.quantity_available > 0:
+            self._in_stock.add(product.product_id)
+        else:
+            self._in_stock.discard(product.product_id)
+
+    def query(self, text=None, product_type=None, weight_bucket=None, in_stock_only=False,
+              min_price=None, max_price=None, limit=None) -> list:
+        # Returns product_ids in (price, product_id) order. The posting sets are intersected in C; a limited query
+        # whose matches are dense enough to fill it early walks the price range and stops, otherwise the matches
+        # are sorted, when few, or used to filter one pass over the price range.
+        filters = []
+        if text:
+            for token in set(self.tokenize(text)):
+                filters.append(self._tokens.get(token, set()))
+        if product_type:
+            filters.append(self._types.get(product_type, set()))
+        if weight_bucket:
+            filters.append(self._weights.get(weight_bucket, set()))
+        if in_stock_only:
+            filters.append(self._in_stock)
+        start = 0 if min_price is None else bisect_left(self._prices, (min_price,))
+        end = len(self._prices) if max_price is None else bisect_right(self._prices, (max_price, chr(0x10FFFF)))
+        filters.sort(key=len)
+        if limit is not None and (not filters or len(filters[0]) >= end - start):
+            product_ids = []
+            for _, product_id in islice(self._prices, start, end):
+                if all(product_id in f for f in filters):
+                    product_ids.append(product_id)
+                    if len(product_ids) >= limit:
+                        break
+            return product_ids
+        if not filters:
+            product_ids = [product_id for _, product_id in islice(self._prices, start, end)]
+        else:
+            matches = filters[0].intersection(*filters[1:]) if len(filters) > 1 else filters[0]
+            if limit is not None and limit * (end - start) < len(matches) ** 2:
+                product_ids = []
+                for _, product_id in islice(self._prices, start, end):
+                    if product_id in matches:
+                        product_ids.append(product_id)
+                        if len(product_ids) >= limit:
+                            break
+            elif len(matches) * 16 < end - start:
+                keys = sorted(key for key in ((self._catalog[product_id].price, product_id) for product_id in matches)
+                              if (min_price is None or key[0] >= min_price) and (max_price is None or key[0] <= max_price))
+                product_ids = [product_id for _, product_id in keys]
+            else:
+                product_ids = [product_id for _, product_id in islice(self._prices, start, end) if product_id in matches]
+        return product_ids if limit is None else product_ids[:limit]
+
+    def facets(self, product_ids) -> dict:
+        product_ids = set(product_ids)
+        return {
+            'type': {name: len(product_ids & ids) for name, ids in self._types.items() if product_ids & ids},
+            'weight': {label: len(product_ids & self._weights[label])
+                       for _, label in self.WEIGHT_BUCKETS if product_ids & self._weights.get(label, set())},
+        }
+class CatalogFileIndex:
+    # product_id -> (offset, length) of its line in a JSON Lines catalog, kept in SQLite next to the catalog.
+    # It is rebuilt only when the catalog's size or mtime no longer matches the recorded signature.
+    def __init__(self, catalog_file: str, index_file=None, on_progress=None):
+        self._catalog_file = catalog_file
+        self._conn = sqlite3.connect(index_file or catalog_file + '.idx', check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS products "
+                           "(product_id TEXT PRIMARY KEY, offset INTEGER NOT NULL, length INTEGER NOT NULL) WITHOUT ROWID")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        stat = os.stat(catalog_file)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        if row is None or row[0] != signature:
+            self._build(signature, on_progress)
+        self._file = open(catalog_file, 'rb')
+
+    def _build(self, signature: str, on_progress, batch_size=10000, progress_every=10000):
+        self._conn.execute("DELETE FROM products")
+        batch = []
+        count = 0
+        offset = 0
+        with open(self._catalog_file, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    batch.append((json.loads(line)['product_id'], offset, len(line)))
+                    count += 1
+                    if len(batch) >= batch_size:
+                        self._conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?)", batch)
+                        batch = []
+                    if on_progress and count % progress_every == 0:
+                        on_progress(self._catalog_file, count, offset)
+                offset += len(line)
+        self._conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?)", batch)
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature', ?)", (signature,))
+        self._conn.commit()
+        if on_progress:
+            on_progress(self._catalog_file, count, offset)
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def read(self, product_id: str):
+        row = self._conn.execute("SELECT offset, length FROM products WHERE product_id = ?", (product_id,)).fetchone()
+        if row is None:
+            return None
+        self._file.seek(row[0])
+        return json.loads(self._file.read(row[1]))
+
+    def product_ids(self, after=None, batch_size=1000):
+        # Ordered by product_id, fetched a batch at a time so no cursor stays open between batches
+        while True:
+            rows = self._conn.execute("SELECT product_id FROM products WHERE product_id > ? ORDER BY product_id LIMIT ?",
+                                      (after or '', batch_size)).fetchall()
+            for (product_id,) in rows:
+                yield product_id
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][0]
+
+    def close(self) -> None:
+        self._file.close()
+        self._conn.close()
+class ProductCache:
+    # Bounded LRU of materialized products; callers serialize access (InventoryService holds its lock)
+    def __init__(self, loader, capacity=10000):
+        self._loader = loader
+        self._capacity = capacity
+        self._products = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def evictions(self):
+        return self._evictions
+
+    def __len__(self):
+        return len(self._products)
+
+    def get(self, product_id: str):
+        product = self._products.get(product_id)
+        if product is not None:
+            self._hits += 1
+            self._products.move_to_end(product_id)
+            return product
+        self._misses += 1
+        product = self._loader(product_id)
+        if product is None:
+            return None
+        self._products[product_id] = product
+        if len(self._products) > self._capacity:
+            self._products.popitem(last=False)
+            self._evictions += 1
+        return product
+
+    def stats(self) -> dict:
+        return {'size': len(self._products), 'capacity': self._capacity, 'hits': self._hits,
+                'misses': self._misses, 'evictions': self._evictions}
+class Order:
+    __slots__ = ('_order_id', '_idempotency_key', '_customer_id', '_session_id', '_created_at', '_lines', '_totals')
+
+    def __init__(self, order_id: str, idempotency_key: str, customer_id: str, session_id: str, created_at: str,
+                 lines, totals: dict):
+        self._order_id = order_id
+        self._idempotency_key = idempotency_key
+        self._customer_id = customer_id
+        self._session_id = session_id
+        self._created_at = created_at
+        self._lines = tuple(dict(line) for line in lines)
+        self._totals = dict(totals)
+
+    @property
+    def order_id(self):
+        return self._order_id
+
+    @property
+    def idempotency_key(self):
+        return self._idempotency_key
+
+    @property
+    def customer_id(self):
+        return self._customer_id
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    @property
+    def created_at(self):
+        return self._created_at
+
+    @property
+    def lines(self):
+        return [dict(line) for line in self._lines]
+
+    @property
+    def totals(self):
+        return dict(self._totals)
+
+    def __str__(self) -> str:
+        items = sum(line['quantity'] for line in self._lines)
+        return (f"Order {self._order_id} | Customer: {self._customer_id} | Placed: {self._created_at} | "
+                f"Items: {items} | Total: ${self._totals['total']:.2f}")
+
+    def to_dict(self) -> dict:
+        return {
+            'order_id': self._order_id,
+            'idempotency_key': self._idempotency_key,
+            'customer_id': self._customer_id,
+            'session_id': self._session_id,
+            'created_at': self._created_at,
+            'lines': self.lines,
+            'totals': self.totals,
+        }
+class OrderLog:
+    # Append-only JSON Lines file of orders. In memory it keeps only byte offsets, indexed by order_id,
+    # idempotency key and customer, so lookups and order history never scan the log.
+    def __init__(self, order_file='orders.jsonl'):
+        self._order_file = order_file
+        self._lock = threading.Lock()
+        self._offsets = {}  # order_id: offset of its line
+        self._keys = {}  # idempotency_key: order_id
+        self._by_customer = {}  # customer_id: order_ids, oldest first
+        self._writer = None
+        self._reader = None
+        self._load()
+
+    def _load(self) -> None:
+        offset = 0
+        try:
+            with open(self._order_file, 'rb') as f:
+                for line in f:
+                    # A partial record, or a whole one missing its newline, is an append that never completed;
+                    # it is cut off so the next order starts on a line of its own
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    self._index(record, offset)
+                    offset += len(line)
+        except FileNotFoundError:
+            return
+        if offset != os.path.getsize(self._order_file):
+            os.truncate(self._order_file, offset)
+
+    def _index(self, record: dict, offset: int) -> None:
+        self._offsets[record['order_id']] = offset
+        self._keys[record['idempotency_key']] = record['order_id']
+        self._by_customer.setdefault(record['customer_id'], []).append(record['order_id'])
+
+    def _read(self, order_id: str) -> Order:
+        # Caller holds the lock
+        if self._reader is None:
+            self._reader = open(self._order_file, 'rb')
+        self._reader.seek(self._offsets[order_id])
+        data = json.loads(self._reader.readline())
+        return Order(data['order_id'], data['idempotency_key'], data['customer_id'], data['session_id'],
+                     data['created_at'], data['lines'], data['totals'])
+
+    def append(self, order: Order) -> tuple:
+        # Returns (order, True) once the order is durable, or (earlier order, False) if its idempotency key was seen
+        with self._lock:
+            if order.idempotency_key in self._keys:
+                return self._read(self._keys[order.idempotency_key]), False
+            if self._writer is None:
+                self._writer = open(self._order_file, 'ab')
+            offset = self._writer.tell()
+            self._writer.write(json.dumps(order.to_dict(), separators=(',', ':')).encode('utf-8') + b'\n')
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+            self._index(order.to_dict(), offset)
+            return order, True
+
+    def get(self, order_id: str):
+        with self._lock:
+            return self._read(order_id) if order_id in self._offsets else None
+
+    def find_by_key(self, idempotency_key: str):
+        with self._lock:
+            order_id = self._keys.get(idempotency_key)
+            return self._read(order_id) if order_id else None
+
+    def orders_for_customer(self, customer_id: str, limit=None) -> list:
+        # Newest first
+        with self._lock:
+            order_ids = self._by_customer.get(customer_id, [])
+            order_ids = order_ids[::-1] if limit is None else order_ids[:-limit - 1:-1]
+            return [self._read(order_id) for order_id in order_ids]
+
+    def close(self) -> None:
+        with self._lock:
+            for f in (self._writer, self._reader):
+                if f is not None:
+                    f.close()
+            self._writer = None
+            self._reader = None
+class InventoryService:
+    PRODUCT_SORT_ORDERS = ('product_id', 'name', 'price')
+    PRODUCT_TYPES = {'product': Product, 'physical': PhysicalProduct, 'digital': DigitalProduct}
+
+    def __init__(self, product_catalog_file='products.json', stock_file='stock.jsonl', reservation_ttl=900.0,
+                 compact_every=1000, on_progress=None, clock=time.monotonic, pricing=None, lazy=False, cache_size=10000,
+                 order_file='orders.jsonl'):
         self._product_catalog_file = product_catalog_file
-        self._cart_state_file = cart_state_file
+        self._pricing = pricing if pricing is not None else PricingEngine()
+        self._orders = OrderLog(order_file)
+        self._on_progress = on_progress
+        # Persisted stock is on-hand stock; reservations live in memory and carts re-reserve when they reload
+        self._stock_file = stock_file
+        self._stock_log = None
+        self._stock_records = 0
+        self._compact_every = compact_every
+        self._reservation_ttl = reservation_ttl
+        self._clock = clock
+        # Guards stock levels and reservations; every cart session goes through it
+        self._lock = threading.Lock()
+        self._reservations = {}  # (session_id, product_id): [quantity, expires_at]
+        self._reserved_totals = {}  # product_id: quantity held across all sessions
+        self._expiry_heap = []  # (expires_at, session_id, product_id), stale entries skipped when popped
+        self._expired = {}  # session_id: product_ids whose reservation lapsed, until the cart collects them
+        self._carts = {}  # session_id: ShoppingCart
+        # Held while a cart is looked up and built, so a session is never loaded, and its saved lines reserved, twice.
+        # Separate from _lock because building a cart reserves stock through it
+        self._carts_lock = threading.Lock()
+        self._lazy = lazy
+        if lazy:
+            # Products are read from disk on first use and kept in a bounded cache; stock levels that differ from
+            # the catalog file are held here so they survive eviction
+            if not product_catalog_file.lower().endswith('.jsonl'):
+                raise ValueError("A lazy catalog must be a JSON Lines file.")
+            self._file_index = CatalogFileIndex(product_catalog_file, on_progress=on_progress)
+            self._cache = ProductCache(self._load_product, cache_size)
+            self._stock_levels = {}  # product_id: quantity_available
+            self._catalog = None
+            self._index = None
+            self._product_orders = {'product_id': None}
+            self._load_stock()
+            return
         self._catalog = self._load_catalog()
-        self._load_cart_state()
+        self._load_stock()
+        # Sorted key lists backing cursor pagination; every key ends with the product_id so it is unique
+        self._index = CatalogIndex(self._catalog)
+        self._product_orders = {sort_by: sorted(self._sort_key(product, sort_by) for product in self._catalog.values())
+                                for sort_by in self.PRODUCT_SORT_ORDERS if sort_by != 'price'}
+        self._product_orders['price'] = self._index.prices
+
+    def _sort_key(self, product: Product, sort_by: str) -> tuple:
+        if sort_by == 'name':
+            return (product.name.casefold(), product.product_id)
+        if sort_by == 'price':
+            return (product.price, product.product_id)
+        return (product.product_id,)
+
+    @staticmethod
+    def _product_from_dict(data: dict) -> Product:
+        p_type = data.get('type', 'product')
+        if p_type == 'physical':
+            return PhysicalProduct(
+                data['product_id'], data['name'], data['price'],
+                data['quantity_available'], data['weight']
+            )
+        if p_type == 'digital':
+            return DigitalProduct(
+                data['product_id'], data['name'], data['price'],
+                data['quantity_available'], data['download_link']
+            )
+        return Product(
+            data['product_id'], data['name'], data['price'],
+            data['quantity_available']
+        )
 
     def _load_catalog(self) -> dict:
         catalog = {}
         try:
-            with open(self._product_catalog_file, 'r') as f:
-                data_list = json.load(f)
-                for data in data_list:
-                    p_type = data.get('type', 'product')
-                    if p_type == 'physical':
-                        product = PhysicalProduct(
-                            data['product_id'], data['name'], data['price'],
-                            data['quantity_available'], data['weight']
-                        )
-                    elif p_type == 'digital':
-                        product = DigitalProduct(
-                            data['product_id'], data['name'], data['price'],
-                            data['quantity_available'], data['download_link']
-                        )
-                    else:
-                        product = Product(
-                            data['product_id'], data['name'], data['price'],
-                            data['quantity_available']
-                        )
-                    catalog[product.product_id] = product
+            for data in iter_json_records(self._product_catalog_file, self._on_progress):
+                product = self._product_from_dict(data)
+                catalog[product.product_id] = product
         except FileNotFoundError:
             print("Product catalog file not found. Starting with empty catalog.")
         return catalog
 
+    def _load_product(self, product_id: str):
+        data = self._file_index.read(product_id)
+        if data is None:
+            return None
+        product = self._product_from_dict(data)
+        if product_id in self._stock_levels:
+            product.quantity_available = self._stock_levels[product_id]
+        return product
+
+    def _product(self, product_id: str):
+        # Caller holds the lock in lazy mode, so a product is never materialized twice
+        if self._lazy:
+            return self._cache.get(product_id)
+        return self._catalog.get(product_id)
+
+    def _stock_changed(self, product: Product) -> None:
+        if self._lazy:
+            self._stock_levels[product.product_id] = product.quantity_available
+        else:
+            self._index.update_stock(product)
+
+    def cache_stats(self):
+        return self._cache.stats() if self._lazy else None
+
+    def _load_stock(self):
+        torn = False
+        try:
+            with open(self._stock_file, 'r') as f:
+                for line in f:
+                    # A crash mid-append can leave a partial record, or a whole one without its newline that the
+                    # next append would run on into; either way the append never completed
+                    if not line.endswith('\n'):
+                        torn = True
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        torn = True
+                        break
+                    # A record with a type is a whole product added since the catalog file was last written
+                    if self._lazy:
+                        if 'type' in record:
+                            raise ValueError("The stock log holds products not yet in the catalog file; "
+                                             "open the inventory once with lazy=False to fold them in.")
+                        self._stock_levels[record['product_id']] = record['quantity_available']
+                    elif 'type' in record:
+                        self._catalog[record['product_id']] = self._product_from_dict(record)
+                    else:
+                        product = self._catalog.get(record['product_id'])
+                        if product:
+                            product.quantity_available = record['quantity_available']
+                    self._stock_records += 1
+        except FileNotFoundError:
+            return
+        if torn:
+            self._compact_stock()
+
+    def _on_hand(self, product: Product) -> int:
+        return product.quantity_available + self._reserved_totals.get(product.product_id, 0)
+
+    def _save_catalog(self):
+        tmp_path = self._product_catalog_file + '.tmp'
+        records = (dict(product.to_dict(), quantity_available=self._on_hand(product)) for product in self._catalog.values())
+        with open(tmp_path, 'w') as f:
+            if self._product_catalog_file.lower().endswith('.jsonl'):
+                for record in records:
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            else:
+                json.dump(list(records), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._product_catalog_file)
+
+    def _compact_stock(self):
+        # Fold the logged stock levels into the catalog file, then start an empty log. A lazy catalog is never
+        # rewritten; its log is compacted down to one line per SKU whose stock has changed.
+        if self._stock_log is not None:
+            self._stock_log.close()
+        if self._lazy:
+            tmp_path = self._stock_file + '.tmp'
+            with open(tmp_path, 'w') as f:
+                for product_id, quantity in self._stock_levels.items():
+                    on_hand = quantity + self._reserved_totals.get(product_id, 0)
+                    f.write(json.dumps({'product_id': product_id, 'quantity_available': on_hand},
+                                       separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._stock_file)
+            self._stock_log = open(self._stock_file, 'a')
+            self._stock_records = len(self._stock_levels)
+            return
+        self._save_catalog()
+        self._stock_log = open(self._stock_file, 'w')
+        self._stock_records = 0
+
+    def _save_stock(self, product_ids):
+        self._append_stock([{'product_id': product_id, 'quantity_available': self._on_hand(self._product(product_id))}
+                            for product_id in product_ids])
+
+    def _append_stock(self, records):
+        lines = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        if self._stock_log is None:
+            self._stock_log = open(self._stock_file, 'a')
+        self._stock_log.write(lines)
+        self._stock_log.flush()
+        os.fsync(self._stock_log.fileno())
+        self._stock_records += len(records)
+        if self._stock_records >= self._compact_every + (len(self._stock_levels) if self._lazy else 0):
+            self._compact_stock()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._stock_log is not None:
+                self._stock_log.close()
+                self._stock_log = None
+            if self._lazy:
+                self._file_index.close()
+        self._orders.close()
+
+    def _expire(self, now: float) -> None:
+        # Caller holds the lock
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, session_id, product_id = heapq.heappop(self._expiry_heap)
+            reservation = self._reservations.get((session_id, product_id))
+            if reservation is None or reservation[1] != expires_at:
+                continue  # released, or extended by a later reservation
+            self._release(session_id, product_id, reservation[0])
+            self._expired.setdefault(session_id, set()).add(product_id)
+
+    def _release(self, session_id: str, product_id: str, quantity: int) -> int:
+        # Caller holds the lock; returns what the session still holds
+        key = (session_id, product_id)
+        reservation = self._reservations[key]
+        product = self._product(product_id)
+        product.increase_quantity(quantity)
+        self._stock_changed(product)
+        reservation[0] -= quantity
+        self._reserved_totals[product_id] -= quantity
+        if not self._reserved_totals[product_id]:
+            del self._reserved_totals[product_id]
+        if not reservation[0]:
+            del self._reservations[key]
+        return reservation[0]
+
+    @property
+    def pricing(self):
+        return self._pricing
+
+    @property
+    def orders(self):
+        return self._orders
+
+    def get_product(self, product_id: str):
+        with self._lock:
+            return self._product(product_id)
+
+    def reserve(self, session_id: str, product_id: str, quantity: int):
+        # Returns the session's new reserved quantity for the product, or None if stock is short
+        if quantity <= 0:
+            return None
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            product = self._product(product_id)
+            if not product or not product.decrease_quantity(quantity):
+                return None
+            return self._hold(session_id, product, quantity, now)
+
+    def _hold(self, session_id: str, product: Product, quantity: int, now: float) -> int:
+        # Caller holds the lock and has already taken the quantity off the product's stock
+        product_id = product.product_id
+        self._stock_changed(product)
+        reservation = self._reservations.setdefault((session_id, product_id), [0, 0.0])
+        reservation[0] += quantity
+        reservation[1] = now + self._reservation_ttl
+        heapq.heappush(self._expiry_heap, (reservation[1], session_id, product_id))
+        self._reserved_totals[product_id] = self._reserved_totals.get(product_id, 0) + quantity
+        self._expired.get(session_id, set()).discard(product_id)
+        return reservation[0]
+
+    def reserve_many(self, session_id: str, lines, atomic=True) -> tuple:
+        # Validates every (product_id, quantity) line against stock under one lock, duplicates summed, then applies
+        # all of them, or with atomic=False only the valid ones. Returns ({product_id: reserved quantity}, results).
+        lines = list(lines)
+        results = []
+        totals = {}
+        for product_id, quantity in lines:
+            if not isinstance(quantity, int) or quantity <= 0:
+                results.append([product_id, "Invalid quantity."])
+                continue
+            totals[product_id] = totals.get(product_id, 0) + quantity
+            results.append([product_id, "OK"])
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            errors = {}
+            for product_id, quantity in totals.items():
+                product = self._product(product_id)
+                if product is None:
+                    errors[product_id] = "Product not found."
+                elif product.quantity_available < quantity:
+                    errors[product_id] = "Insufficient stock."
+            for result in results:
+                if result[1] == "OK" and result[0] in errors:
+                    result[1] = errors[result[0]]
+            if atomic and any(message != "OK" for _, message in results):
+                return {}, [(product_id, "Skipped." if message == "OK" else message) for product_id, message in results]
+            reserved = {}
+            for product_id, quantity in totals.items():
+                if product_id in errors:
+                    continue
+                product = self._product(product_id)
+                product.decrease_quantity(quantity)
+                reserved[product_id] = self._hold(session_id, product, quantity, now)
+        return reserved, [tuple(result) for result in results]
+
+    def transfer(self, from_session: str, to_session: str, product_ids) -> dict:
+        # Moves one session's reservations onto another without touching stock; returns the new quantities
+        moved = {}
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            for product_id in product_ids:
+                reservation = self._reservations.pop((from_session, product_id), None)
+                if reservation is None:
+                    continue  # lapsed since the cart last looked
+                quantity = reservation[0]
+                reservation = self._reservations.setdefault((to_session, product_id), [0, 0.0])
+                reservation[0] += quantity
+                reservation[1] = now + self._reservation_ttl
+                heapq.heappush(self._expiry_heap, (reservation[1], to_session, product_id))
+                self._expired.get(to_session, set()).discard(product_id)
+                moved[product_id] = reservation[0]
+        return moved
+
+    def release(self, session_id: str, product_id: str, quantity=None) -> int:
+        # Returns the quantity the session still holds; None releases the whole reservation
+        with self._lock:
+            self._expire(self._clock())
+            reservation = self._reservations.get((session_id, product_id))
+            if reservation is None:
+                return 0
+            return self._release(session_id, product_id, reservation[0] if quantity is None else min(quantity, reservation[0]))
+
+    def reserved(self, session_id: str, product_id: str) -> int:
+        with self._lock:
+            self._expire(self._clock())
+            reservation = self._reservations.get((session_id, product_id))
+            return reservation[0] if reservation else 0
+
+    def pop_expired(self, session_id: str) -> set:
+        with self._lock:
+            self._expire(self._clock())
+            return self._expired.pop(session_id, set())
+
+    def expire_reservations(self) -> None:
+        with self._lock:
+            self._expire(self._clock())
+
+    def add_product(self, product: Product) -> bool:
+        # New SKUs join the search index and the sort orders in place. The whole product record is appended to the
+        # stock log and folded into the catalog file at the next compaction, so adding one never rewrites the rest.
+        if self._lazy:
+            raise ValueError("Products can only be added to the in-memory catalog; open the inventory with lazy=False.")
+        with self._lock:
+            if product.product_id in self._catalog:
+                return False
+            self._catalog[product.product_id] = product
+            self._index.add(product)
+            for sort_by, order in self._product_orders.items():
+                if order is not self._index.prices:
+                    insort(order, self._sort_key(product, sort_by))
+            self._append_stock([product.to_dict()])
+        return True
+
+    def restock(self, product_id: str, quantity: int) -> bool:
+        if quantity <= 0:
+            return False
+        with self._lock:
+            product = self._product(product_id)
+            if not product:
+                return False
+            product.increase_quantity(quantity)
+            self._stock_changed(product)
+            self._save_stock((product_id,))
+        return True
+
+    def refresh(self, session_id: str, lines) -> bool:
+        # Extends the session's reservations if it still holds every (product_id, quantity) line
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            reservations = [self._reservations.get((session_id, product_id)) for product_id, _ in lines]
+            if any(reservation is None or reservation[0] < quantity
+                   for reservation, (_, quantity) in zip(reservations, lines)):
+                return False
+            for reservation, (product_id, _) in zip(reservations, lines):
+                reservation[1] = now + self._reservation_ttl
+                heapq.heappush(self._expiry_heap, (reservation[1], session_id, product_id))
+            return True
+
+    def commit(self, session_id: str, product_ids) -> dict:
+        # Turns the session's reservations into sales: on-hand stock drops by the reserved quantity and is journaled
+        committed = {}
+        with self._lock:
+            for product_id in product_ids:
+                reservation = self._reservations.pop((session_id, product_id), None)
+                if reservation is None:
+                    continue
+                self._reserved_totals[product_id] -= reservation[0]
+                if not self._reserved_totals[product_id]:
+                    del self._reserved_totals[product_id]
+                committed[product_id] = reservation[0]
+            if committed:
+                self._save_stock(list(committed))
+        return committed
+
+    def get_cart(self, session_id: str, cart_state_file=None):
+        with self._carts_lock:
+            cart = self._carts.get(session_id)
+            if cart is None:
+                cart = ShoppingCart(cart_state_file=cart_state_file or f'cart_{session_id}.json', inventory=self,
+                                    session_id=session_id)
+                self._carts[session_id] = cart
+        return cart
+
+    def search_products(self, text=None, product_type=None, weight_bucket=None, in_stock_only=False,
+                        min_price=None, max_price=None, limit=None) -> list:
+        if self._lazy:
+            raise ValueError("Catalog search needs the in-memory catalog index; open the inventory with lazy=False.")
+        with self._lock:
+            self._expire(self._clock())
+            product_ids = self._index.query(text, product_type, weight_bucket, in_stock_only, min_price, max_price, limit)
+        return [self._catalog[product_id] for product_id in product_ids]
+
+    def product_facets(self, text=None, product_type=None, weight_bucket=None, in_stock_only=False,
+                       min_price=None, max_price=None) -> dict:
+        if self._lazy:
+            raise ValueError("Catalog facets need the in-memory catalog index; open the inventory with lazy=False.")
+        with self._lock:
+            self._expire(self._clock())
+            product_ids = self._index.query(text, product_type, weight_bucket, in_stock_only, min_price, max_price)
+            return self._index.facets(product_ids)
+
+    def iter_products(self, sort_by='product_id', after=None, in_stock_only=False, product_type=None,
+                      min_price=None, max_price=None):
+        # Resumes strictly after the cursor, so paging is stable; a price sort narrows the scan to the price range
+        if sort_by not in self._product_orders:
+            raise ValueError(f"Unknown sort order: {sort_by}")
+        self.expire_reservations()
+        if isinstance(after, str):
+            after = (after,)
+        if self._lazy:
+            yield from self._iter_lazy_products(after, in_stock_only, product_type, min_price, max_price)
+            return
+        order = self._product_orders[sort_by]
+        start = bisect_right(order, after) if after else 0
+        end = len(order)
+        if sort_by == 'price':
+            if min_price is not None:
+                start = max(start, bisect_left(order, (min_price,)))
+            if max_price is not None:
+                end = bisect_right(order, (max_price, chr(0x10FFFF)))
+        for key in islice(order, start, end):
+            product = self._catalog[key[-1]]
+            if in_stock_only and product.quantity_available <= 0:
+                continue
+            if product_type and type(product) is not self.PRODUCT_TYPES[product_type]:
+                continue
+            if min_price is not None and product.price < min_price:
+                continue
+            if max_price is not None and product.price > max_price:
+                continue
+            yield key, product
+
+    def _iter_lazy_products(self, after, in_stock_only, product_type, min_price, max_price):
+        # Walks the on-disk index in product_id order; products pass through the cache like any other lookup
+        for product_id in self._file_index.product_ids(after[0] if after else None):
+            product = self.get_product(product_id)
+            if in_stock_only and product.quantity_available <= 0:
+                continue
+            if product_type and type(product) is not self.PRODUCT_TYPES[product_type]:
+                continue
+            if min_price is not None and product.price < min_price:
+                continue
+            if max_price is not None and product.price > max_price:
+                continue
+            yield (product_id,), product
+
+    def list_products(self, limit=20, sort_by='product_id', after=None, in_stock_only=False, product_type=None,
+                      min_price=None, max_price=None) -> tuple:
+        products = self.iter_products(sort_by, after, in_stock_only, product_type, min_price, max_price)
+        page = list(islice(products, limit + 1))
+        next_cursor = page[limit - 1][0] if len(page) > limit else None
+        return [product for _, product in page[:limit]], next_cursor
+class ShoppingCart:
+    def __init__(self, product_catalog_file='products.json', cart_state_file='cart.json', on_progress=None,
+                 stock_file='stock.jsonl', compact_every=1000, inventory=None, session_id='default'):
+        self._items = {}  # key: product_id, value: CartItem
+        self._item_order = []  # sorted product_ids of the cart items, for cursor pagination
+        self._cart_state_file = cart_state_file
+        self._session_id = session_id
+        # A standalone cart owns a private inventory; carts sharing one are opened with InventoryService.get_cart
+        self._owns_inventory = inventory is None
+        if inventory is None:
+            inventory = InventoryService(product_catalog_file, stock_file, compact_every=compact_every,
+                                         on_progress=on_progress)
+        self._inventory = inventory
+        # Running totals kept in step with the lines: subtotal, discount and tax in cents, weight in grams
+        self._pricing = inventory.pricing
+        self._pricing_version = self._pricing.version
+        self._line_prices = {}  # product_id: (subtotal, discount, tax, grams)
+        self._totals = [0, 0, 0, 0]
+        self._load_cart_state()
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    @property
+    def inventory(self):
+        return self._inventory
+
     def _load_cart_state(self):
         try:
             with open(self._cart_state_file, 'r') as f:
                 data_list = json.load(f)
                 for data in data_list:
                     product_id = data['product_id']
-                    quantity = data['quantity']
-                    product = self._catalog.get(product_id)
-                    if product:
-                        # Reduce stock based on cart
-                        if product.decrease_quantity(quantity):
-                            self._items[product_id] = CartItem(product, quantity)
+                    # Stock on disk excludes carts, so the saved lines are reserved again rather than decremented twice
+                    reserved = self._inventory.reserve(self._session_id, product_id, data['quantity'])
+                    if reserved:
+                        self._items[product_id] = CartItem(self._inventory.get_product(product_id), reserved)
+                        insort(self._item_order, product_id)
+                        self._reprice(product_id)
         except FileNotFoundError:
             pass
 
-    def _save_catalog(self):
-        data_list = [product.to_dict() for product in self._catalog.values()]
-        with open(self._product_catalog_file, 'w') as f:
-            json.dump(data_list, f, indent=2)
-
     def _save_cart_state(self):
         data_list = [item.to_dict() for item in self._items.values()]
         with open(self._cart_state_file, 'w') as f:
             json.dump(data_list, f, indent=2)
 
+    def _drop_item(self, product_id: str) -> CartItem:
+        del self._item_order[bisect_left(self._item_order, product_id)]
+        item = self._items.pop(product_id)
+        self._reprice(product_id)
+        return item
+
+    def _reprice(self, product_id: str) -> None:
+        # Swap one line's contribution in the running totals; O(1) whatever the cart size
+        old = self._line_prices.pop(product_id, None)
+        if old is not None:
+            for position, value in enumerate(old):
+                self._totals[position] -= value
+        item = self._items.get(product_id)
+        if item is not None:
+            new = self._pricing.price_line(item.product, item.quantity)
+            self._line_prices[product_id] = new
+            for position, value in enumerate(new):
+                self._totals[position] += value
+
+    def _reprice_all(self) -> None:
+        self._line_prices = {}
+        self._totals = [0, 0, 0, 0]
+        for product_id in self._items:
+            self._reprice(product_id)
+        self._pricing_version = self._pricing.version
+
+    def _collect_expired(self) -> None:
+        # Lines whose reservation timed out were already put back on the shelf by the inventory
+        expired = [product_id for product_id in self._inventory.pop_expired(self._session_id) if product_id in self._items]
+        for product_id in expired:
+            self._drop_item(product_id)
+        if expired:
+            self._save_cart_state()
+
+    def close(self) -> None:
+        if self._owns_inventory:
+            self._inventory.close()
+
+    def _set_line(self, product_id: str, quantity: int) -> None:
+        if product_id in self._items:
+            self._items[product_id].quantity = quantity
+        else:
+            self._items[product_id] = CartItem(self._inventory.get_product(product_id), quantity)
+            insort(self._item_order, product_id)
+        self._reprice(product_id)
+
+    def add_items(self, lines, atomic=True) -> tuple:
+        # lines are (product_id, quantity) pairs; stock for all of them is checked together and the cart saved once
+        self._collect_expired()
+        reserved, results = self._inventory.reserve_many(self._session_id, lines, atomic)
+        for product_id, quantity in reserved.items():
+            self._set_line(product_id, quantity)
+        if reserved:
+            self._save_cart_state()
+        return bool(results) and all(message == "OK" for _, message in results), results
+
+    def merge_cart(self, other, atomic=True) -> tuple:
+        # Folds another session's cart (e.g. a guest cart) into this one. The guest's reservations move across,
+        # so the stock it already holds cannot be lost to another shopper halfway through. Lines whose reservation
+        # lapsed are reserved again like add_items: all of them, or with atomic=False only those still in stock.
+        # Every guest line is reported.
+        if other is self or other.inventory is not self._inventory:
+            raise ValueError("Only a different cart on the same inventory can be merged.")
+        lines = [(product_id, item.quantity) for product_id, item in other._items.items() if item.quantity > 0]
+        self._collect_expired()
+        other._collect_expired()
+        lapsed = [(product_id, quantity) for product_id, quantity in lines if product_id not in other._items]
+        reserved, lapsed_results = self._inventory.reserve_many(self._session_id, lapsed, atomic)
+        messages = dict(lapsed_results)
+        if atomic and any(message != "OK" for message in messages.values()):
+            # Nothing was reserved; the guest keeps the lines it still holds
+            return False, [(product_id, messages.get(product_id, "Skipped.")) for product_id, _ in lines]
+        held = [product_id for product_id, _ in lines if product_id in other._items]
+        moved = self._inventory.transfer(other.session_id, self._session_id, held)
+        late = [(product_id, other._items[product_id].quantity) for product_id in held if product_id not in moved]
+        if late:
+            # Lapsed between the expiry check and the transfer; their stock is back on the shelf
+            late_reserved, late_results = self._inventory.reserve_many(self._session_id, late, atomic=False)
+            reserved.update(late_reserved)
+            messages.update(late_results)
+        for product_id, quantity in list(moved.items()) + list(reserved.items()):
+            self._set_line(product_id, quantity)
+        for product_id in list(other._items):
+            other._drop_item(product_id)
+        other._save_cart_state()
+        self._save_cart_state()
+        results = [(product_id, "OK" if product_id in moved else messages[product_id]) for product_id, _ in lines]
+        return all(message == "OK" for _, message in results), results
+
+    def checkout(self, customer_id: str, idempotency_key=None):
+        # The order append is the commit point. A retry with the same idempotency key returns the recorded order
+        # and takes no more stock; if the earlier attempt stopped after the append, the retry finishes it.
+        self._collect_expired()
+        orders = self._inventory.orders
+        idempotency_key = idempotency_key or uuid4().hex
+        lines = [(product_id, item.quantity) for product_id, item in self._items.items() if item.quantity > 0]
+        existing = orders.find_by_key(idempotency_key)
+        if existing is not None:
+            if (existing.session_id == self._session_id
+                    and sorted(lines) == sorted((line['product_id'], line['quantity']) for line in existing.lines)):
+                self._finish_checkout()
+            return existing
+        if not lines or not self._inventory.refresh(self._session_id, lines):
+            return None
+        totals = self.get_totals()
+        order_lines = []
+        for product_id, quantity in lines:
+            product = self._items[product_id].product
+            subtotal, discount, tax, _ = self._line_prices[product_id]
+            order_lines.append({'product_id': product_id, 'name': product.name, 'unit_price': product.price,
+                                'quantity': quantity, 'subtotal': subtotal / 100, 'discount': discount / 100,
+                                'tax': tax / 100})
+        order = Order(uuid4().hex, idempotency_key, customer_id, self._session_id,
+                      datetime.now().isoformat(timespec='seconds'), order_lines, totals)
+        order, created = orders.append(order)
+        if created:
+            self._finish_checkout()
+        return order
+
+    def _finish_checkout(self) -> None:
+        self._inventory.commit(self._session_id, list(self._items))
+        for product_id in list(self._items):
+            self._drop_item(product_id)
+        self._save_cart_state()
+
+    def order_history(self, customer_id: str, limit=None) -> list:
+        return self._inventory.orders.orders_for_customer(customer_id, limit)
+
     def add_item(self, product_id: str, quantity: int) -> bool:
-        product = self._catalog.get(product_id)
-        if product and quantity > 0:
-            if product.decrease_quantity(quantity):
-                if product_id in self._items:
-                    self._items[product_id].quantity += quantity
-                else:
-                    self._items[product_id] = CartItem(product, quantity)
-                self._save_cart_state()
-                self._save_catalog()
-                return True
-        return False
+        self._collect_expired()
+        reserved = self._inventory.reserve(self._session_id, product_id, quantity)
+        if not reserved:
+            return False
+        self._set_line(product_id, reserved)
+        self._save_cart_state()
+        return True
 
     def remove_item(self, product_id: str) -> bool:
+        self._collect_expired()
         if product_id in self._items:
-            cart_item = self._items.pop(product_id)
+            self._drop_item(product_id)
             # Return stock
-            cart_item.product.increase_quantity(cart_item.quantity)
+            self._inventory.release(self._session_id, product_id)
             self._save_cart_state()
-            self._save_catalog()
             return True
         return False
 
     def update_quantity(self, product_id: str, new_quantity: int) -> bool:
+        self._collect_expired()
         if product_id in self._items and new_quantity >=0:
             cart_item = self._items[product_id]
             current_quantity = cart_item.quantity
             delta = new_quantity - current_quantity
             if delta > 0:
                 # Need more stock
-                if cart_item.product.decrease_quantity(delta):
-                    cart_item.quantity = new_quantity
-                else:
+                reserved = self._inventory.reserve(self._session_id, product_id, delta)
+                if not reserved:
                     return False
+                cart_item.quantity = reserved
             elif delta < 0:
                 # Return stock
-                cart_item.product.increase_quantity(-delta)
-                cart_item.quantity = new_quantity
+                cart_item.quantity = self._inventory.release(self._session_id, product_id, -delta)
             else:
                 return True  # No change
+            self._reprice(product_id)
             self._save_cart_state()
-            self._save_catalog()
             return True
         return False
 
+    def get_totals(self) -> dict:
+        self._collect_expired()
+        if self._pricing_version != self._pricing.version:
+            self._reprice_all()
+        subtotal, discount, tax, grams = self._totals
+        shipping = self._pricing.shipping(subtotal - discount, grams)
+        return {
+            'subtotal': subtotal / 100,
+            'discount': discount / 100,
+            'shipping': shipping / 100,
+            'tax': tax / 100,
+            'total': (subtotal - discount + shipping + tax) / 100,
+        }
+
     def get_total(self) -> float:
-        total = sum(item.calculate_subtotal() for item in self._items.values())
-        return total
+        return self.get_totals()['total']
+
+    def display_totals(self) -> None:
+        totals = self.get_totals()
+        print(f"Subtotal: ${totals['subtotal']:.2f}")
+        if totals['discount']:
+            print(f"Discounts: -${totals['discount']:.2f}")
+        if totals['shipping']:
+            print(f"Shipping: ${totals['shipping']:.2f}")
+        if totals['tax']:
+            print(f"Tax: ${totals['tax']:.2f}")
+        print(f"Grand Total: ${totals['total']:.2f}\n")
+
+    def iter_products(self, *args, **kwargs):
+        return self._inventory.iter_products(*args, **kwargs)
+
+    def search_products(self, *args, **kwargs) -> list:
+        return self._inventory.search_products(*args, **kwargs)
+
+    def list_products(self, *args, **kwargs) -> tuple:
+        return self._inventory.list_products(*args, **kwargs)
+
+    def iter_cart(self, after=None):
+        self._collect_expired()
+        start = bisect_right(self._item_order, after) if after else 0
+        for product_id in islice(self._item_order, start, None):
+            yield self._items[product_id]
+
+    def list_cart(self, limit=20, after=None) -> tuple:
+        page = list(islice(self.iter_cart(after), limit + 1))
+        next_cursor = page[limit - 1].product.product_id if len(page) > limit else None
+        return page[:limit], next_cursor
 
     def display_cart(self) -> None:
+        self._collect_expired()
         if not self._items:
             print("Your cart is empty.")
             return
         print("\nCurrent Shopping Cart:")
         print("-" * 50)
-        for item in self._items.values():
+        for item in self.iter_cart():
             print(str(item))
         print("-" * 50)
-        print(f"Grand Total: ${self.get_total():.2f}\n")
+        self.display_totals()
 
     def display_products(self) -> None:
-        if not self._catalog:
+        products, _ = self.list_products(1)
+        if not products:
             print("No products available.")
             return
         print("\nAvailable Products:")
         print("-" * 50)
-        for product in self._catalog.values():
+        for _, product in self.iter_products():
             print(product.display_details())
         print("-" * 50)
+PAGE_SIZE = 20
+
+def print_pages(fetch_page) -> None:
+    cursor = None
+    while True:
+        items, cursor = fetch_page(cursor)
+        for item in items:
+            print(item)
+        if cursor is None:
+            return
+        if input("Press Enter for the next page, or Q to stop: ").strip().lower() == 'q':
+            return
+
 def main():
     cart = ShoppingCart()
 
@@ -268,14 +1432,26 @@ def main():
         print("3. View Cart")
         print("4. Update Quantity")
         print("5. Remove Item")
-        print("6. Exit")
+        print("6. Search Products")
+        print("7. Add Multiple Items")
+        print("8. Checkout")
+        print("9. Order History")
+        print("10. Exit")
         print("=====================================")
 
     while True:
         show_menu()
-        choice = input("Enter your choice (1-6): ").strip()
+        choice = input("Enter your choice (1-10): ").strip()
         if choice == '1':
-            cart.display_products()
+            sort_by = input("Sort by (product_id/name/price) [product_id]: ").strip().lower() or 'product_id'
+            if sort_by not in InventoryService.PRODUCT_SORT_ORDERS:
+                print("Invalid sort order.")
+                continue
+            in_stock_only = input("In-stock products only? (y/n): ").strip().lower() == 'y'
+            print("\nAvailable Products:")
+            print("-" * 50)
+            print_pages(lambda after: cart.list_products(PAGE_SIZE, sort_by, after, in_stock_only))
+            print("-" * 50)
         elif choice == '2':
             product_id = input("Enter Product ID to add: ").strip()
             try:
@@ -291,7 +1467,14 @@ def main():
             else:
                 print("Failed to add item. Check product ID and stock.")
         elif choice == '3':
-            cart.display_cart()
+            if not cart.list_cart(1)[0]:
+                print("Your cart is empty.")
+                continue
+            print("\nCurrent Shopping Cart:")
+            print("-" * 50)
+            print_pages(lambda after: cart.list_cart(PAGE_SIZE, after))
+            print("-" * 50)
+            cart.display_totals()
         elif choice == '4':
             product_id = input("Enter Product ID to update: ").strip()
             try:
@@ -313,10 +1496,61 @@ def main():
             else:
                 print("Product not found in cart.")
         elif choice == '6':
+            text = input("Enter search words (blank for any): ").strip() or None
+            product_type = input("Product type (physical/digital/product, blank for any): ").strip().lower() or None
+            try:
+                max_price = input("Maximum price (blank for any): ").strip()
+                max_price = float(max_price) if max_price else None
+            except ValueError:
+                print("Invalid price.")
+                continue
+            in_stock_only = input("In-stock products only? (y/n): ").strip().lower() == 'y'
+            results = cart.search_products(text, product_type, None, in_stock_only, None, max_price, PAGE_SIZE)
+            if not results:
+                print("No matching products found.")
+                continue
+            for product in results:
+                print(product)
+            if len(results) == PAGE_SIZE:
+                print(f"Showing the first {PAGE_SIZE} matches. Narrow the search to see more.")
+        elif choice == '7':
+            entries = [entry.strip() for entry in input("Enter items as ID:quantity separated by commas: ").split(',')
+                       if entry.strip()]
+            lines = []
+            for entry in entries:
+                product_id, _, quantity = entry.partition(':')
+                try:
+                    lines.append((product_id.strip(), int(quantity or 1)))
+                except ValueError:
+                    lines.append((product_id.strip(), 0))
+            atomic = input("Add only if every item is in stock? (y/n): ").strip().lower() != 'n'
+            success, results = cart.add_items(lines, atomic)
+            for product_id, message in results:
+                print(f"{product_id}: {message}")
+            print("Items added." if success else "Some items were not added." if not atomic else "No items were added.")
+        elif choice == '8':
+            customer_id = input("Enter customer ID: ").strip()
+            if not customer_id:
+                print("Customer ID is required.")
+                continue
+            order = cart.checkout(customer_id)
+            if order:
+                print(f"Order placed. {order}")
+            else:
+                print("Checkout failed. The cart is empty or its reservations have expired.")
+        elif choice == '9':
+            customer_id = input("Enter customer ID: ").strip()
+            orders = cart.order_history(customer_id, PAGE_SIZE)
+            if not orders:
+                print("No orders found.")
+            for order in orders:
+                print(order)
+        elif choice == '10':
             print("Exiting. Saving data...")
+            cart.close()
             break
         else:
-            print("Invalid choice. Please select from 1-6.")
+            print("Invalid choice. Please select from 1-10.")
 
 if __name__ == "__main__":
     main()